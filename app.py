@@ -1,6 +1,11 @@
 import sys
 from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent))
+
+# Streamlit réexécute ce script à chaque interaction : n'ajouter le chemin qu'une fois
+_ROOT = str(Path(__file__).parent)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
 from ui.streamlit.app import StreamlitChatApp
 
 if __name__ == "__main__":
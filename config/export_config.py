@@ -1,7 +1,11 @@
 """Gestionnaire de configuration pour les options d'export"""
 import configparser
 import os
-from typing import Dict
+from types import MappingProxyType
+from typing import Mapping
+
+# Valeurs considérées comme "activé"
+_TRUTHY = frozenset({'oui', 'yes', 'true', '1', 'on', 'actif', 'activé'})
 
 
 class ExportConfig:
@@ -20,11 +24,38 @@ class ExportConfig:
 
     def _load_config(self):
         """Charge le fichier de configuration"""
-        if os.path.exists(self.config_path):
-            self.config.read(self.config_path, encoding='utf-8')
-        else:
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                self.config.read_file(f, source=self.config_path)
+        except FileNotFoundError:
             # Créer une configuration par défaut si le fichier n'existe pas
             self._create_default_config()
+        except OSError:
+            # Fichier illisible (droits, répertoire...) : ignoré comme le faisait
+            # ConfigParser.read(), les options gardent leur valeur par défaut
+            pass
+
+        # Figer l'état des exports une fois pour toutes
+        self._enabled = MappingProxyType({
+            'excel': self._read_option('Excel'),
+            'powerpoint': self._read_option('PowerPoint')
+        })
+
+    def _read_option(self, option: str) -> bool:
+        """
+        Lit une option de la section EXPORTS.
+
+        Args:
+            option: Nom de l'option
+
+        Returns:
+            True si activé (valeur par défaut), False sinon
+        """
+        try:
+            value = self.config.get('EXPORTS', option, fallback='oui')
+            return self._parse_bool(value)
+        except Exception:
+            return True  # Par défaut, activé
 
     def _create_default_config(self):
         """Crée et sauvegarde la configuration par défaut"""
@@ -57,8 +88,7 @@ class ExportConfig:
         if isinstance(value, bool):
             return value
 
-        value_lower = str(value).lower().strip()
-        return value_lower in ('oui', 'yes', 'true', '1', 'on', 'actif', 'activé')
+        return str(value).lower().strip() in _TRUTHY
 
     def is_excel_enabled(self) -> bool:
         """
@@ -67,11 +97,7 @@ class ExportConfig:
         Returns:
             True si activé, False sinon
         """
-        try:
-            value = self.config.get('EXPORTS', 'Excel', fallback='oui')
-            return self._parse_bool(value)
-        except Exception:
-            return True  # Par défaut, activé
+        return self._enabled['excel']
 
     def is_powerpoint_enabled(self) -> bool:
         """
@@ -80,23 +106,16 @@ class ExportConfig:
         Returns:
             True si activé, False sinon
         """
-        try:
-            value = self.config.get('EXPORTS', 'PowerPoint', fallback='oui')
-            return self._parse_bool(value)
-        except Exception:
-            return True  # Par défaut, activé
+        return self._enabled['powerpoint']
 
-    def get_enabled_exports(self) -> Dict[str, bool]:
+    def get_enabled_exports(self) -> Mapping[str, bool]:
         """
         Retourne l'état de tous les exports.
 
         Returns:
-            Dictionnaire avec l'état de chaque export
+            Dictionnaire (lecture seule) avec l'état de chaque export
         """
-        return {
-            'excel': self.is_excel_enabled(),
-            'powerpoint': self.is_powerpoint_enabled()
-        }
+        return self._enabled
 
     def reload(self):
         """Recharge la configuration depuis le fichier"""
@@ -1,11 +1,16 @@
 """Configuration du système RAG depuis fichier YAML."""
+import sys
 import yaml
-from pathlib import Path
 from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 
+from config.yaml_loader import load_yaml, get_mtime_ns, SafeDumper
 
-@dataclass
+# __slots__ générés par dataclass à partir de Python 3.10 (pas de __dict__ par instance)
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_SLOTS)
 class ExpandContextConfig:
     """Configuration de l'extension du contexte."""
     enabled: bool = True
@@ -14,7 +19,7 @@ class ExpandContextConfig:
     merge_adjacent: bool = True
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ModelConfig:
     """Configuration des modèles API."""
     embedding_model: str = "BAAI/bge-m3"  # Modèle d'embedding par défaut
@@ -22,24 +27,28 @@ class ModelConfig:
     embedding_dimensions: Optional[int] = None  # Dimensions des embeddings (optionnel)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class RetrievalConfig:
     """Configuration de la recherche sémantique."""
     top_k: int = 40
     min_score: float = 0.1
     batch_size: int = 32
+    prefetch_factor: int = 2
+    quantization_oversampling: float = 0.0
     expand_context: ExpandContextConfig = field(default_factory=ExpandContextConfig)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class RerankingConfig:
     """Configuration du reranking."""
     top_n: int = 8
     min_rerank_score: float = 0.0
     batch_size: int = 32
+    max_docs: int = 100
+    max_tokens: int = 0
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ChunkingConfig:
     """Configuration du découpage de texte."""
     chunk_size: int = 1000
@@ -49,7 +58,7 @@ class ChunkingConfig:
     ])
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ContextConfig:
     """Configuration du contexte pour le LLM."""
     max_tokens: int = 8000
@@ -60,7 +69,7 @@ class ContextConfig:
     )
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class HighlightingConfig:
     """Configuration du surlignage."""
     min_word_length: int = 3
@@ -68,23 +77,25 @@ class HighlightingConfig:
     highlight_color: str = "#fff3a0"
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class PerformanceConfig:
     """Configuration des performances."""
     use_cache: bool = True
     cache_size: int = 256
     clear_gpu_memory: bool = True
+    preload_sparse_model: bool = True
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class DebugConfig:
     """Configuration du débogage."""
     show_message_order: bool = False
     show_scores: bool = False
     show_rag_context: bool = False
+    show_rerank_requests: bool = False
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class RAGConfig:
     """Configuration complète du système RAG."""
 
@@ -100,16 +111,17 @@ class RAGConfig:
     @classmethod
     def from_yaml(cls, yaml_path: str = "rag.yml") -> "RAGConfig":
         """Charge la configuration depuis un fichier YAML."""
-        path = Path(yaml_path)
-
-        if not path.exists():
+        try:
+            data = load_yaml(yaml_path)
+        except FileNotFoundError:
             print(f"⚠️ Fichier {yaml_path} introuvable, utilisation des valeurs par défaut")
             return cls()
+        except Exception as e:
+            print(f"❌ Erreur lors du chargement de {yaml_path}: {e}")
+            print("Utilisation des valeurs par défaut")
+            return cls()
 
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f)
-
             if not data:
                 print(f"⚠️ Fichier {yaml_path} vide, utilisation des valeurs par défaut")
                 return cls()
@@ -120,6 +132,8 @@ class RAGConfig:
                     top_k=data.get('retrieval', {}).get('top_k', 40),
                     min_score=data.get('retrieval', {}).get('min_score', 0.1),
                     batch_size=data.get('retrieval', {}).get('batch_size', 32),
+                    prefetch_factor=data.get('retrieval', {}).get('prefetch_factor', 2),
+                    quantization_oversampling=data.get('retrieval', {}).get('quantization_oversampling', 0.0),
                     expand_context=ExpandContextConfig(
                         **data.get('retrieval', {}).get('expand_context', {})
                     )
@@ -139,28 +153,22 @@ class RAGConfig:
 
     def to_dict(self) -> Dict[str, Any]:
         """Convertit la configuration en dictionnaire."""
-        retrieval_dict = self.retrieval.__dict__.copy()
-        retrieval_dict['expand_context'] = self.retrieval.expand_context.__dict__
-
-        return {
-            'models': self.models.__dict__,
-            'retrieval': retrieval_dict,
-            'reranking': self.reranking.__dict__,
-            'chunking': self.chunking.__dict__,
-            'context': self.context.__dict__,
-            'highlighting': self.highlighting.__dict__,
-            'performance': self.performance.__dict__,
-            'debug': self.debug.__dict__
-        }
+        return asdict(self)
 
     def save(self, yaml_path: str = "rag.yml"):
         """Sauvegarde la configuration dans un fichier YAML."""
         with open(yaml_path, 'w', encoding='utf-8') as f:
-            yaml.dump(self.to_dict(), f, default_flow_style=False, allow_unicode=True)
+            yaml.dump(
+                self.to_dict(), f,
+                Dumper=SafeDumper,
+                default_flow_style=False,
+                allow_unicode=True
+            )
 
 
 # Instance globale de configuration
 _rag_config: Optional[RAGConfig] = None
+_rag_config_mtime: Optional[int] = None
 
 
 def get_rag_config(reload: bool = False) -> RAGConfig:
@@ -173,9 +181,13 @@ def get_rag_config(reload: bool = False) -> RAGConfig:
     Returns:
         Instance de RAGConfig
     """
-    global _rag_config
+    global _rag_config, _rag_config_mtime
     if _rag_config is None or reload:
-        _rag_config = RAGConfig.from_yaml()
+        # Réutiliser l'instance si le fichier n'a pas changé depuis le dernier chargement
+        mtime = get_mtime_ns("rag.yml")
+        if _rag_config is None or mtime is None or mtime != _rag_config_mtime:
+            _rag_config = RAGConfig.from_yaml()
+            _rag_config_mtime = mtime
     return _rag_config
 
 
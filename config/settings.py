@@ -1,21 +1,75 @@
 """Configuration de l'application."""
 import os
+import sys
+from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
 
 # Charger les variables d'environnement
 load_dotenv()
 
-# ✅ CORRECTION : Utiliser BASE-URL et API-KEY avec tirets
-BASE_URL = os.getenv("BASE-URL", "https://albert.api.etalab.gouv.fr")
-API_KEY = os.getenv("API-KEY", "")
+# __slots__ générés par dataclass à partir de Python 3.10 (pas de __dict__ par instance)
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-# Configuration Qdrant
-QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
-QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
-QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", None)
 
-# Collections distantes
-ENABLE_REMOTE_COLLECTIONS = os.getenv("ENABLE_REMOTE_COLLECTIONS", "true").lower() == "true"
+def _env_int(name: str, default: int) -> int:
+    """Lit une variable d'environnement entière (valeur par défaut si invalide)."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"⚠️ WARNING: {name}={value!r} n'est pas un entier, utilisation de {default}")
+        return default
+
+
+@dataclass(frozen=True, **_SLOTS)
+class Settings:
+    """Variables d'environnement lues une seule fois au démarrage."""
+    base_url: str
+    api_key: str
+    qdrant_host: str
+    qdrant_port: int
+    qdrant_api_key: Optional[str]
+    qdrant_prefer_grpc: bool
+    qdrant_grpc_port: int
+    enable_remote_collections: bool
+    albert_max_concurrency: int
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Construit les paramètres depuis l'environnement."""
+        env = os.environ
+        return cls(
+            # ✅ CORRECTION : Utiliser BASE-URL et API-KEY avec tirets
+            base_url=env.get("BASE-URL", "https://albert.api.etalab.gouv.fr"),
+            api_key=env.get("API-KEY", ""),
+            # Configuration Qdrant
+            qdrant_host=env.get("QDRANT_HOST", "localhost"),
+            qdrant_port=_env_int("QDRANT_PORT", 6333),
+            qdrant_api_key=env.get("QDRANT_API_KEY"),
+            # gRPC (protobuf) : nécessite le port gRPC exposé par Qdrant
+            qdrant_prefer_grpc=env.get("QDRANT_PREFER_GRPC", "false").lower() == "true",
+            qdrant_grpc_port=_env_int("QDRANT_GRPC_PORT", 6334),
+            # Collections distantes
+            enable_remote_collections=env.get("ENABLE_REMOTE_COLLECTIONS", "true").lower() == "true",
+            # Appels simultanés maximum vers l'API (limite par clé)
+            albert_max_concurrency=_env_int("ALBERT_MAX_CONCURRENCY", 10),
+        )
+
+
+settings = Settings.from_env()
+
+# Alias historiques (préférer l'objet settings)
+BASE_URL = settings.base_url
+API_KEY = settings.api_key
+
+QDRANT_HOST = settings.qdrant_host
+QDRANT_PORT = settings.qdrant_port
+QDRANT_API_KEY = settings.qdrant_api_key
+
+ENABLE_REMOTE_COLLECTIONS = settings.enable_remote_collections
 
 # Validation
 if not API_KEY:
@@ -0,0 +1,60 @@
+"""Chargement des fichiers YAML avec cache invalidé par date de modification."""
+import os
+from functools import lru_cache
+from typing import Any, Optional
+
+import yaml
+
+# Utiliser le parser C (libyaml) quand il est disponible
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+
+@lru_cache(maxsize=32)
+def _parse_yaml(path: str, mtime_ns: int) -> Any:
+    """
+    Parse un fichier YAML.
+
+    Le résultat est mémorisé pour un couple (chemin, mtime) : tant que le
+    fichier n'est pas modifié, il n'est ni relu ni reparsé.
+    """
+    with open(path, 'rb') as f:
+        return yaml.load(f.read(), Loader=SafeLoader)
+
+
+def get_mtime_ns(path: str) -> Optional[int]:
+    """
+    Retourne la date de modification d'un fichier en nanosecondes.
+
+    Args:
+        path: Chemin du fichier
+
+    Returns:
+        mtime en nanosecondes, ou None si le fichier n'existe pas
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_yaml(path: str) -> Any:
+    """
+    Charge un fichier YAML en réutilisant le résultat en cache si le fichier
+    n'a pas changé depuis le dernier chargement.
+
+    Les données retournées sont partagées entre appels : ne pas les modifier.
+
+    Args:
+        path: Chemin du fichier YAML
+
+    Returns:
+        Données parsées
+
+    Raises:
+        FileNotFoundError: Si le fichier n'existe pas
+    """
+    path = os.fspath(path)
+    return _parse_yaml(path, os.stat(path).st_mtime_ns)
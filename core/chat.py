@@ -1,26 +1,56 @@
-from typing import List, Dict, Any, Optional, Iterator
-from openai import OpenAI
+from typing import List, Dict, Any, Optional, Iterator, Sequence, TYPE_CHECKING
+from collections import Counter
+import re
 
 from .models import Message, ChatRequest, ChatResponse, ChatContext, RAGDocument
-from services.rag import build_rag_system_message
-from services.rag_remote import build_rag_context_from_remote
-from utils.images import encode_image
+
+# Les services RAG et le SDK OpenAI sont importés à l'utilisation
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# Rôles des messages échangés (par opposition aux messages système)
+_USER_ASSISTANT_ROLES = frozenset({"user", "assistant"})
+_SYSTEM_ROLE = "system"
+
+# Les messages RAG contiennent l'en-tête du template et des références de chunks/scores
+_RAG_MESSAGE_RE = re.compile(
+    "Les informations suivantes proviennent de documents internes"
+    "|# chunk"
+    "|# score"
+)
 
 
 class ChatManager:
     """Gère la conversation et les interactions avec le LLM."""
 
-    def __init__(self, client: OpenAI):
+    def __init__(self, client: "OpenAI"):
         self.client = client
+        self._role_counts: Counter = Counter()
         self.conversation: List[Message] = []
 
+    @property
+    def conversation(self) -> List[Message]:
+        """Messages de la conversation (à modifier via add_message)."""
+        return self._conversation
+
+    @conversation.setter
+    def conversation(self, messages: List[Message]):
+        self._conversation = messages
+        self._role_counts = Counter(msg.role for msg in messages)
+
+    def _has_user_or_assistant(self) -> bool:
+        """Indique si la conversation contient déjà un échange user/assistant."""
+        return bool(self._role_counts["user"] or self._role_counts["assistant"])
+
     def add_message(self, message: Message):
         """Ajoute un message à la conversation."""
-        self.conversation.append(message)
+        self._conversation.append(message)
+        self._role_counts[message.role] += 1
 
     def clear_conversation(self):
         """Efface toute la conversation."""
-        self.conversation.clear()
+        self._conversation.clear()
+        self._role_counts.clear()
 
     def reset_for_new_context(self):
         """
@@ -32,7 +62,7 @@ class ChatManager:
         # Garder uniquement les messages user et assistant
         self.conversation = [
             msg for msg in self.conversation
-            if msg.role in ("user", "assistant")
+            if msg.role in _USER_ASSISTANT_ROLES
         ]
 
     def should_reset_for_new_context(self, new_context: ChatContext) -> bool:
@@ -46,64 +76,60 @@ class ChatManager:
         if not self.conversation:
             return False
 
-        # Vérifier s'il y a déjà des messages système
-        has_system_messages = any(msg.role == "system" for msg in self.conversation)
-
-        # Si pas de messages système et nouveau contexte, on peut l'ajouter
-        if not has_system_messages:
+        # Sans nouveau contexte, rien à remplacer
+        has_new_context = bool(
+            new_context.system_prompt
+            or new_context.pdf_text
+            or new_context.url_content
+        )
+        if not has_new_context:
             return False
 
         # Si on a déjà des messages système et qu'on veut en ajouter de nouveaux,
         # il faut reset
-        has_new_context = any([
-            new_context.system_prompt,
-            new_context.pdf_text,
-            new_context.url_content
-        ])
+        return self._role_counts[_SYSTEM_ROLE] > 0
 
-        return has_system_messages and has_new_context
+    def get_conversation(self) -> Sequence[Message]:
+        """Retourne la conversation actuelle (lecture seule, sans copie)."""
+        return self._conversation
 
-    def get_conversation(self) -> List[Message]:
-        """Retourne la conversation actuelle."""
-        return self.conversation.copy()
+    def get_conversation_copy(self) -> List[Message]:
+        """Retourne une copie modifiable de la conversation actuelle."""
+        return self._conversation.copy()
 
-    def get_messages_for_saving(self) -> List[Message]:
+    def get_messages_for_saving(self, debug: bool = False) -> List[Message]:
         """
         Retourne les messages à sauvegarder dans l'historique.
         Exclut les messages système RAG qui sont temporaires.
+
+        Args:
+            debug: Affiche les messages sauvegardés
         """
+        is_rag_message = self._is_rag_message
         messages_to_save = [
             msg for msg in self.conversation
-            if msg.role in ("user", "assistant") or
-               (msg.role == "system" and not self._is_rag_message(msg))
+            if msg.role in _USER_ASSISTANT_ROLES or
+               (msg.role == _SYSTEM_ROLE and not is_rag_message(msg))
         ]
 
         # Debug : afficher ce qui sera sauvegardé
-        print(f"\n💾 Messages à sauvegarder: {len(messages_to_save)}")
-        for i, msg in enumerate(messages_to_save, 1):
-            role = msg.role
-            content = msg.content if isinstance(msg.content, str) else "[multimodal]"
-            preview = content[:80] + "..." if len(content) > 80 else content
-            print(f"   {i}. [{role.upper()}] {preview}")
+        if debug:
+            print(f"\n💾 Messages à sauvegarder: {len(messages_to_save)}")
+            for i, msg in enumerate(messages_to_save, 1):
+                role = msg.role
+                content = msg.content if isinstance(msg.content, str) else "[multimodal]"
+                preview = content[:80] + "..." if len(content) > 80 else content
+                print(f"   {i}. [{role.upper()}] {preview}")
 
         return messages_to_save
 
     def _is_rag_message(self, message: Message) -> bool:
         """Détermine si un message système est un message RAG."""
-        if message.role != "system":
-            return False
-
-        content = message.content
-        if isinstance(content, str):
-            # Les messages RAG contiennent ces patterns
-            rag_patterns = [
-                "Les informations suivantes proviennent de documents internes",
-                "# chunk",  # Les messages RAG contiennent des références de chunks
-                "# score",  # Les messages RAG contiennent des scores
-            ]
-            return any(pattern in content for pattern in rag_patterns)
-
-        return False
+        return (
+            message.role == _SYSTEM_ROLE
+            and isinstance(message.content, str)
+            and _RAG_MESSAGE_RE.search(message.content) is not None
+        )
 
     def build_user_message(
         self,
@@ -112,14 +138,13 @@ class ChatManager:
     ) -> Message:
         """Construit un message utilisateur avec texte et optionnellement une image."""
         if image_data:
-            img_b64 = encode_image(image_data)
+            from utils.images import encode_image_data_url
+
             content = [
                 {"type": "text", "text": text},
                 {
                     "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{img_b64}"
-                    }
+                    "image_url": {"url": encode_image_data_url(image_data)}
                 }
             ]
         else:
@@ -136,12 +161,7 @@ class ChatManager:
         Cette fonction ne doit être appelée qu'au début d'une conversation ou après clear_conversation().
         """
         # Vérifier qu'il n'y a pas déjà de messages user/assistant
-        has_user_or_assistant = any(
-            msg.role in ("user", "assistant")
-            for msg in self.conversation
-        )
-
-        if has_user_or_assistant:
+        if self._has_user_or_assistant():
             # Si la conversation a déjà commencé, ne pas ajouter de messages système
             # Car OpenAI n'autorise pas system après user/assistant
             return
@@ -182,24 +202,23 @@ class ChatManager:
         Returns:
             Liste de messages au format dict pour l'API
         """
+        # Séparer les messages par rôle en un seul passage
         messages = []
-
-        # Séparer les messages par rôle
-        system_messages = [msg for msg in self.conversation if msg.role == "system"]
-        user_assistant_messages = [msg for msg in self.conversation if msg.role in ("user", "assistant")]
-
-        # 1. Ajouter d'abord TOUS les messages système permanents
-        for msg in system_messages:
-            messages.append(msg.to_dict())
-
+        user_assistant_messages = []
+        for msg in self.conversation:
+            if msg.role == _SYSTEM_ROLE:
+                messages.append(msg.to_dict())
+            elif msg.role in _USER_ASSISTANT_ROLES:
+                user_assistant_messages.append(msg.to_dict())
+
+        # 1. Les messages système permanents sont déjà en tête
         # 2. Insérer le contexte RAG (aussi un message système)
         #    AVANT tous les messages user/assistant
         if rag_context:
             messages.append(rag_context)
 
         # 3. Ajouter tous les messages user/assistant
-        for msg in user_assistant_messages:
-            messages.append(msg.to_dict())
+        messages.extend(user_assistant_messages)
 
         return messages
 
@@ -242,17 +261,17 @@ class ChatManager:
             stream=stream
         )
 
+        # Boucle chaude : accès directs aux attributs des chunks du SDK
         for chunk in response_stream:
-            if not chunk.choices:
+            choices = chunk.choices
+            if not choices:
                 continue
 
-            choice = chunk.choices[0]
-            delta = getattr(choice, "delta", None)
-
-            if not delta:
+            delta = choices[0].delta
+            if delta is None:
                 continue
 
-            content = getattr(delta, "content", None)
+            content = delta.content
             if content:
                 yield content
 
@@ -278,12 +297,7 @@ class ChatManager:
             is_remote_collection: True si la collection est distante
             debug: Active le mode debug
         """
-        is_first_message = not any(
-            msg.role in ("user", "assistant")
-            for msg in self.conversation
-        )
-
-        if is_first_message:
+        if not self._has_user_or_assistant():
             self.add_context(request.context)
 
         # Récupérer le contexte RAG
@@ -301,6 +315,7 @@ class ChatManager:
             # MODIFICATION : Choisir entre RAG local ou distant
             if is_remote_collection:
                 # Utiliser le RAG distant (Albert API)
+                from services.rag_remote import build_rag_context_from_remote
                 result = build_rag_context_from_remote(
                     self.client,
                     rag_collection,
@@ -328,19 +343,7 @@ class ChatManager:
                     print(f"   - Nombre de documents: {len(rag_docs_list)}")
 
                 # Convertir les dicts en RAGDocument
-                rag_docs = [
-                    RAGDocument(
-                        id=d.get("id", ""),
-                        text=d.get("text", ""),
-                        score=d.get("score", 0.0),
-                        filename=d.get("filename"),
-                        filepath=d.get("filepath"),
-                        chunk_id=d.get("chunk_id"),
-                        model=d.get("model"),
-                        rerank_score=d.get("rerank_score")
-                    )
-                    for d in rag_docs_list
-                ]
+                rag_docs = [RAGDocument.from_dict(d) for d in rag_docs_list]
             else:
                 if debug:
                     source = "distant" if is_remote_collection else "local"
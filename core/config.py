@@ -1,9 +1,8 @@
 """Configuration centrale de l'application."""
-from typing import Dict, Optional
-import yaml
-from pathlib import Path
+from functools import cached_property
+from typing import Dict, Optional, Tuple
 
-from services.llm import get_llm_client, list_available_models
+from config.yaml_loader import load_yaml
 from core.models import ModelInfo, ModelCapabilities
 
 
@@ -17,48 +16,56 @@ class AppConfig:
         Args:
             prompts_file: Chemin vers le fichier de prompts
         """
-        # Client LLM (OpenAI)
-        self.llm_client = get_llm_client()
+        # Client LLM, prompts et modèles sont chargés à la première utilisation
+        self.prompts_file = prompts_file
 
-        # Charger les prompts
-        self.prompts = self._load_prompts(prompts_file)
+    @cached_property
+    def llm_client(self):
+        """Client LLM (OpenAI), créé au premier accès."""
+        from services.llm import get_llm_client
+        return get_llm_client()
 
-        # Charger les modèles disponibles
-        self.available_models = self._load_models()
+    @cached_property
+    def prompts(self) -> Dict[str, str]:
+        """Prompts disponibles, chargés au premier accès."""
+        return self._load_prompts(self.prompts_file)
+
+    @cached_property
+    def available_models(self) -> Dict[str, ModelInfo]:
+        """Modèles disponibles, récupérés depuis l'API au premier accès."""
+        return self._load_models()
 
     def _load_prompts(self, prompts_file: str) -> Dict[str, str]:
         """Charge les prompts depuis le fichier YAML."""
-        path = Path(prompts_file)
-
-        if not path.exists():
-            return {"Défaut": "Tu es un assistant serviable."}
-
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f)
-                raw_prompts = data.get("prompts", {})
-
-                # Extraire la valeur de 'prompt' pour chaque entrée
-                processed_prompts = {}
-                for name, content in raw_prompts.items():
-                    if isinstance(content, dict) and 'prompt' in content:
-                        # Extraire la valeur du prompt
-                        processed_prompts[name] = content['prompt']
-                    elif isinstance(content, str):
-                        # Si c'est déjà un string, le garder tel quel
-                        processed_prompts[name] = content
-                    else:
-                        # Par défaut, convertir en string
-                        processed_prompts[name] = str(content)
-
-                return processed_prompts
-
+            data = load_yaml(prompts_file)
+            raw_prompts = data.get("prompts", {})
+
+            # Extraire la valeur de 'prompt' pour chaque entrée
+            processed_prompts = {}
+            for name, content in raw_prompts.items():
+                if isinstance(content, dict) and 'prompt' in content:
+                    # Extraire la valeur du prompt
+                    processed_prompts[name] = content['prompt']
+                elif isinstance(content, str):
+                    # Si c'est déjà un string, le garder tel quel
+                    processed_prompts[name] = content
+                else:
+                    # Par défaut, convertir en string
+                    processed_prompts[name] = str(content)
+
+            return processed_prompts
+
+        except FileNotFoundError:
+            return {"Défaut": "Tu es un assistant serviable."}
         except Exception as e:
             print(f"Erreur chargement prompts : {e}")
             return {"Défaut": "Tu es un assistant serviable."}
 
     def _load_models(self) -> Dict[str, ModelInfo]:
         """Charge les modèles disponibles depuis l'API."""
+        from services.llm import list_available_models
+
         models_dict = {}
 
         try:
@@ -85,10 +92,23 @@ class AppConfig:
 
         return models_dict
 
-    @property
-    def available_prompts(self) -> list:
+    @cached_property
+    def available_prompts(self) -> Tuple[str, ...]:
         """Retourne la liste des prompts disponibles."""
-        return list(self.prompts.keys())
+        return tuple(self.prompts)
+
+    @cached_property
+    def available_model_labels(self) -> Tuple[str, ...]:
+        """Noms d'affichage des modèles, dans l'ordre de available_models."""
+        return tuple(self._display_name_to_id)
+
+    @cached_property
+    def _display_name_to_id(self) -> Dict[str, str]:
+        """Index nom d'affichage -> ID de modèle."""
+        return {
+            model_info.display_name: model_id
+            for model_id, model_info in self.available_models.items()
+        }
 
     def get_prompt(self, prompt_name: str) -> Optional[str]:
         """Récupère un prompt par son nom."""
@@ -104,15 +124,36 @@ class AppConfig:
         Returns:
             ID du modèle ou None
         """
-        for model_id, model_info in self.available_models.items():
-            if model_info.display_name == display_name:
-                return model_id
-        return None
+        return self._display_name_to_id.get(display_name)
 
     def reload_prompts(self, prompts_file: str = "prompts.yml"):
         """Recharge les prompts depuis le fichier."""
-        self.prompts = self._load_prompts(prompts_file)
+        self.prompts_file = prompts_file
+        self.__dict__.pop('prompts', None)
+        self.__dict__.pop('available_prompts', None)
 
     def reload_models(self):
-        """Recharge la liste des modèles disponibles."""
-        self.available_models = self._load_models()
+        """Recharge la liste des modèles disponibles (au prochain accès)."""
+        from services.llm import invalidate_llm_caches
+
+        invalidate_llm_caches()
+        self.__dict__.pop('available_models', None)
+        self.__dict__.pop('_display_name_to_id', None)
+        self.__dict__.pop('available_model_labels', None)
+
+
+# Instance globale
+_app_config: Optional[AppConfig] = None
+
+
+def get_app_config() -> AppConfig:
+    """
+    Retourne l'instance singleton de la configuration de l'application.
+
+    Returns:
+        Instance de AppConfig
+    """
+    global _app_config
+    if _app_config is None:
+        _app_config = AppConfig()
+    return _app_config
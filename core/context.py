@@ -1,10 +1,205 @@
 """Gestionnaire de contexte pour les documents."""
-from typing import Optional, Any, List
+from typing import Optional, Any, List, Iterator
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
 import io
+import multiprocessing
+import os
+import threading
 from pypdf import PdfReader
 
+# Moteur PDFium (C++), bien plus rapide que pypdf ; pypdf reste le repli
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
 from utils.html import fetch_url_content
 
+# Séparateur des en-têtes de documents
+_BAR = "=" * 80
+
+# Cache LRU du texte extrait des PDFs fournis en bytes : empreinte -> texte
+# (ajouter un PDF à un lot n'analyse que le nouveau fichier)
+_PDF_TEXT_CACHE_SIZE = 64
+_pdf_text_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_pdf_text_cache_lock = threading.Lock()
+
+# Pool de processus d'extraction PDF, partagé et créé à la première utilisation
+# ("spawn" : un fork du serveur Streamlit multithread hériterait de verrous tenus)
+_PDF_POOL_WORKERS = min(4, os.cpu_count() or 1)
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """Retourne le pool de processus d'extraction PDF (singleton)."""
+    global _pdf_pool
+
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=_PDF_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor):
+    """Abandonne un pool cassé : le suivant sera recréé à la demande."""
+    global _pdf_pool
+
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False)
+
+
+def _read_pdf_bytes(pdf_file: Any) -> bytes:
+    """Lit le contenu d'un fichier PDF (UploadedFile, file-like ou bytes)."""
+    if hasattr(pdf_file, 'read'):
+        pdf_bytes = pdf_file.read()
+        # Réinitialiser le pointeur si possible
+        if hasattr(pdf_file, 'seek'):
+            pdf_file.seek(0)
+        return pdf_bytes
+
+    return pdf_file
+
+
+def _disk_path(pdf_file: Any) -> Optional[str]:
+    """Chemin du fichier sur disque (fichier ouvert ou chemin), None sinon."""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        return os.fspath(pdf_file)
+
+    # Un UploadedFile a aussi un attribut name : seul un vrai descripteur
+    # garantit que le nom désigne bien ce fichier
+    try:
+        pdf_file.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+    name = getattr(pdf_file, 'name', None)
+    return name if isinstance(name, str) else None
+
+
+def _is_named_bytes(pdf_file: Any) -> bool:
+    """Indique si le PDF est fourni sous forme de couple (nom, bytes)."""
+    return (
+        isinstance(pdf_file, tuple)
+        and len(pdf_file) == 2
+        and isinstance(pdf_file[1], (bytes, bytearray))
+    )
+
+
+def _pdf_source(pdf_file: Any) -> Any:
+    """
+    Source transmise aux moteurs PDF sans copie complète du fichier.
+
+    Chemin pour un fichier sur disque (ouvert directement par le moteur),
+    flux lui-même pour un file-like en mémoire, bytes sinon.
+    """
+    if _is_named_bytes(pdf_file):
+        return pdf_file[1]
+
+    path = _disk_path(pdf_file)
+    if path is not None:
+        return path
+
+    return pdf_file
+
+
+def _rewind(source: Any) -> None:
+    """Replace un flux au début (sans effet sur un chemin ou des bytes)."""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def _iter_pages_pdfium(source: Any) -> Iterator[str]:
+    """Itère sur le texte des pages avec PDFium (chaque page est libérée aussitôt)."""
+    pdf = pdfium.PdfDocument(source)
+    try:
+        for page_index in range(len(pdf)):
+            page = pdf[page_index]
+            textpage = page.get_textpage()
+            try:
+                # PDFium sépare les lignes par \r\n
+                yield textpage.get_text_range().replace("\r\n", "\n")
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+
+
+def _iter_pages_pypdf(source: Any) -> Iterator[str]:
+    """Itère sur le texte des pages avec pypdf."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    pdf_reader = PdfReader(source)
+    for page in pdf_reader.pages:
+        yield page.extract_text()
+
+
+def _write_pages(buffer: io.StringIO, pages: Iterator[str]) -> bool:
+    """
+    Écrit les pages non vides dans le buffer, séparées par une ligne vide.
+
+    Returns:
+        True si au moins une page a été écrite
+    """
+    first = True
+    for page_num, page_text in enumerate(pages, 1):
+        if not page_text:
+            continue
+        if not first:
+            buffer.write("\n\n")
+        first = False
+        buffer.write(f"--- Page {page_num} ---\n")
+        buffer.write(page_text)
+    return not first
+
+
+def _extract_pdf(source: Any) -> str:
+    """
+    Extrait le texte d'un PDF (bytes, chemin ou flux en mémoire).
+
+    Le texte est écrit page par page dans un buffer plutôt qu'accumulé
+    dans une liste puis concaténé.
+    Fonction de module pour pouvoir être exécutée dans un processus séparé.
+    """
+    try:
+        buffer = None
+        if PDFIUM_AVAILABLE:
+            try:
+                buffer = io.StringIO()
+                has_text = _write_pages(buffer, _iter_pages_pdfium(source))
+            except Exception:
+                # PDF chiffré ou non supporté par PDFium : repli sur pypdf
+                buffer = None
+
+        if buffer is None:
+            _rewind(source)
+            buffer = io.StringIO()
+            has_text = _write_pages(buffer, _iter_pages_pypdf(source))
+
+        if not has_text:
+            return "[Le PDF ne contient pas de texte extractible]"
+
+        return buffer.getvalue()
+
+    except Exception as e:
+        return f"[Erreur lors de l'extraction du PDF: {e}]"
+    finally:
+        # Laisser le flux réutilisable par l'appelant
+        try:
+            _rewind(source)
+        except Exception:
+            pass
+
 
 class ContextManager:
     """Gère l'extraction de contexte depuis différentes sources."""
@@ -14,47 +209,91 @@ class ContextManager:
         Extrait le texte d'un fichier PDF.
 
         Args:
-            pdf_file: Fichier PDF (objet UploadedFile de Streamlit ou file-like)
+            pdf_file: Fichier PDF (objet UploadedFile de Streamlit, file-like
+                ou couple (nom, bytes))
 
         Returns:
             Texte extrait du PDF
         """
-        try:
-            # Créer un buffer bytes depuis le fichier
-            if hasattr(pdf_file, 'read'):
-                pdf_bytes = pdf_file.read()
-                # Réinitialiser le pointeur si possible
-                if hasattr(pdf_file, 'seek'):
-                    pdf_file.seek(0)
-            else:
-                pdf_bytes = pdf_file
-
-            # Créer un reader PDF
-            pdf_reader = PdfReader(io.BytesIO(pdf_bytes))
+        # Pas de read() : le moteur lit directement le fichier ou le flux
+        return _extract_pdf(_pdf_source(pdf_file))
 
-            # Extraire le texte de toutes les pages
-            text_parts = []
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(f"--- Page {page_num} ---\n{page_text}")
-
-            full_text = "\n\n".join(text_parts)
+    def _extract_pdfs_parallel(self, pdf_files: List[Any]) -> List[str]:
+        """
+        Extrait le texte de plusieurs PDFs en parallèle (pool de processus partagé).
 
-            if not full_text.strip():
-                return "[Le PDF ne contient pas de texte extractible]"
+        Les fichiers en mémoire sont lus dans le processus principal (les
+        objets UploadedFile ne sont pas sérialisables) et seuls les bytes sont
+        envoyés ; pour un fichier sur disque, seul le chemin est transmis.
+        Les couples (nom, bytes) sont transmis sans relecture.
+        """
+        if len(pdf_files) == 1:
+            return [self.extract_pdf_text(pdf_files[0])]
 
-            return full_text
+        try:
+            sources = [
+                pdf_file[1] if _is_named_bytes(pdf_file)
+                else _disk_path(pdf_file) or _read_pdf_bytes(pdf_file)
+                for pdf_file in pdf_files
+            ]
+        except Exception as e:
+            return [f"[Erreur lors de l'extraction du PDF: {e}]"] * len(pdf_files)
 
+        pool = None
+        try:
+            pool = _get_pdf_pool()
+            # map() conserve l'ordre de soumission
+            return list(pool.map(_extract_pdf, sources))
         except Exception as e:
-            return f"[Erreur lors de l'extraction du PDF: {e}]"
+            if isinstance(e, BrokenProcessPool):
+                _discard_pdf_pool(pool)
+            # Import local : les processus du pool importent ce module sans le RAG
+            from services.rag import get_rag_logger
+            # Pool indisponible (environnement restreint...) : extraction séquentielle
+            get_rag_logger().warning(f"Extraction parallèle impossible, extraction séquentielle : {e}")
+            return [_extract_pdf(source) for source in sources]
+
+    def _extract_pdfs_cached(self, pdf_files: List[Any]) -> List[str]:
+        """
+        Extrait le texte de plusieurs PDFs en réutilisant les textes déjà extraits.
+
+        Seuls les couples (nom, bytes) sont mis en cache (par empreinte du
+        contenu) ; les PDFs manquants sont extraits ensemble, en parallèle.
+        """
+        keys = [
+            hashlib.blake2b(pdf_file[1], digest_size=16).digest()
+            if _is_named_bytes(pdf_file) else None
+            for pdf_file in pdf_files
+        ]
+
+        texts: List[Optional[str]] = [None] * len(pdf_files)
+        with _pdf_text_cache_lock:
+            for i, key in enumerate(keys):
+                if key is not None and key in _pdf_text_cache:
+                    _pdf_text_cache.move_to_end(key)
+                    texts[i] = _pdf_text_cache[key]
+
+        missing = [i for i, text in enumerate(texts) if text is None]
+        if missing:
+            extracted = self._extract_pdfs_parallel([pdf_files[i] for i in missing])
+            with _pdf_text_cache_lock:
+                for i, text in zip(missing, extracted):
+                    texts[i] = text
+                    # Une erreur (fichier illisible, pool indisponible...) n'est pas mémorisée
+                    if keys[i] is not None and not text.startswith("[Erreur"):
+                        _pdf_text_cache[keys[i]] = text
+                while len(_pdf_text_cache) > _PDF_TEXT_CACHE_SIZE:
+                    _pdf_text_cache.popitem(last=False)
+
+        return texts
 
     def extract_multiple_pdfs_text(self, pdf_files: List[Any]) -> str:
         """
         Extrait le texte de plusieurs fichiers PDF.
 
         Args:
-            pdf_files: Liste de fichiers PDF
+            pdf_files: Liste de fichiers PDF (objets fichiers ou couples
+                (nom, bytes) déjà lus)
 
         Returns:
             Texte extrait de tous les PDFs, séparés par des marqueurs
@@ -62,27 +301,32 @@ class ContextManager:
         if not pdf_files:
             return ""
 
-        all_texts = []
+        pdf_texts = self._extract_pdfs_cached(pdf_files)
+        total = len(pdf_files)
 
-        for idx, pdf_file in enumerate(pdf_files, 1):
+        buffer = io.StringIO()
+        for idx, (pdf_file, pdf_text) in enumerate(zip(pdf_files, pdf_texts), 1):
             # Récupérer le nom du fichier si disponible
-            filename = getattr(pdf_file, 'name', f"Document_{idx}")
-
-            # Extraire le texte
-            pdf_text = self.extract_pdf_text(pdf_file)
+            if _is_named_bytes(pdf_file):
+                filename = pdf_file[0]
+            else:
+                filename = getattr(pdf_file, 'name', f"Document_{idx}")
 
+            if idx > 1:
+                buffer.write("\n\n")
             # Ajouter avec un en-tête clair
-            header = f"\n{'='*80}\n📄 DOCUMENT {idx}/{len(pdf_files)}: {filename}\n{'='*80}\n"
-            all_texts.append(f"{header}{pdf_text}")
+            buffer.write(f"\n{_BAR}\n📄 DOCUMENT {idx}/{total}: {filename}\n{_BAR}\n")
+            buffer.write(pdf_text)
 
-        return "\n\n".join(all_texts)
+        return buffer.getvalue()
 
-    def extract_url_content(self, url: str) -> str:
+    def extract_url_content(self, url: str, raise_errors: bool = False) -> str:
         """
         Extrait le contenu d'une URL.
 
         Args:
             url: URL à extraire
+            raise_errors: Lever l'exception au lieu de renvoyer "[Erreur ...]"
 
         Returns:
             Contenu texte de la page web
@@ -95,7 +339,8 @@ class ContextManager:
                 url=url,
                 timeout=8,
                 max_chars=32_000,
-                preserve_tables=True
+                preserve_tables=True,
+                raise_errors=raise_errors
             )
 
             if content.startswith("[Erreur"):
@@ -104,6 +349,8 @@ class ContextManager:
             return f"--- Contenu de {url} ---\n\n{content}"
 
         except Exception as e:
+            if raise_errors:
+                raise
             return f"[Erreur lors de la récupération de l'URL: {e}]"
 
     def extract_text_file(self, text_file: Any) -> str:
@@ -1,20 +1,40 @@
 """Classes de données pour l'application (UI-agnostic)."""
-from dataclasses import dataclass, field
+import sys
+from dataclasses import dataclass, field, fields
 from typing import List, Dict, Any, Optional, Union
 
+# __slots__ générés par dataclass à partir de Python 3.10 (pas de __dict__ par instance)
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+
+@dataclass(**_SLOTS)
 class Message:
     """Représente un message dans la conversation."""
     role: str  # "user", "assistant", "system"
     content: Union[str, List[Dict[str, Any]]]
+    _api_dict: Optional[Dict[str, Any]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def to_dict(self) -> Dict[str, Any]:
-        """Convertit le message en dictionnaire pour l'API."""
-        return {
-            "role": self.role,
-            "content": self.content
-        }
+        """
+        Convertit le message en dictionnaire pour l'API.
+
+        Le dictionnaire est construit une seule fois puis réutilisé tant que
+        le rôle et le contenu du message ne sont pas réassignés.
+        Il est partagé entre appels : ne pas le modifier.
+        """
+        cached = self._api_dict
+        if (
+            cached is None
+            or cached["content"] is not self.content
+            or cached["role"] != self.role
+        ):
+            cached = self._api_dict = {
+                "role": self.role,
+                "content": self.content
+            }
+        return cached
 
 
 @dataclass
@@ -40,7 +60,7 @@ class ModelCapabilities:
         }
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ModelInfo:
     """Information sur un modèle disponible."""
     id: str
@@ -68,7 +88,7 @@ class ModelInfo:
         return f"{emojis} {self.id}"
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class RAGDocument:
     """Document récupéré par le système RAG."""
     id: str
@@ -80,13 +100,28 @@ class RAGDocument:
     model: Optional[str] = None
     rerank_score: Optional[float] = None
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RAGDocument":
+        """
+        Construit un document depuis un dict renvoyé par le RAG.
+
+        Les clés inconnues (search_method, expanded, ...) sont ignorées.
+        """
+        values = dict(_RAG_DOCUMENT_DEFAULTS)
+        values.update((k, data[k]) for k in _RAG_DOCUMENT_FIELDS if k in data)
+        return cls(**values)
+
     @property
     def best_score(self) -> float:
         """Retourne le meilleur score (rerank ou score original)."""
         return self.rerank_score if self.rerank_score is not None else self.score
 
 
-@dataclass
+_RAG_DOCUMENT_FIELDS = tuple(f.name for f in fields(RAGDocument))
+_RAG_DOCUMENT_DEFAULTS = {"id": "", "text": "", "score": 0.0}
+
+
+@dataclass(**_SLOTS)
 class ChatContext:
     """Contexte additionnel pour la conversation."""
     pdf_text: Optional[str] = None
@@ -95,7 +130,7 @@ class ChatContext:
     rag_documents: List[RAGDocument] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ChatRequest:
     """Requête de chat complète."""
     user_message: str
@@ -103,7 +138,7 @@ class ChatRequest:
     context: ChatContext = field(default_factory=ChatContext)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ChatResponse:
     """Réponse du système de chat."""
     content: str
@@ -1,25 +1,27 @@
-from openai import OpenAI
 from typing import List, Dict
-from config.settings import BASE_URL, API_KEY
+import httpx
+from config.settings import API_KEY
+from services.llm import get_http_client
+
+# Échec rapide si l'API est injoignable, recherche distante plus lente tolérée
+_ALBERT_TIMEOUT = httpx.Timeout(30.0, connect=3.05)
 
 
 class AlbertCollectionsClient:
 
     def __init__(self):
-        self.client = OpenAI(
-            base_url=BASE_URL,
-            api_key=API_KEY,
-        )
+        # Pool HTTP partagé (URL relatives résolues sur BASE_URL)
+        self.http = get_http_client()
         self.headers = {
             "Authorization": f"Bearer {API_KEY}"
         }
 
     def list_collections(self) -> List[Dict]:
-        r = self.client._client.request(
-            method="GET",
-            url="/collections",
+        r = self.http.get(
+            "/collections",
             headers=self.headers,
             params={"limit": 100},
+            timeout=_ALBERT_TIMEOUT,
         )
         return r.json().get("data", [])
 
@@ -29,14 +31,14 @@ class AlbertCollectionsClient:
         query: str,
         limit: int = 10
     ) -> List[Dict]:
-        r = self.client._client.request(
-            method="POST",
-            url=f"/collections/{collection_id}/search",
+        r = self.http.post(
+            f"/collections/{collection_id}/search",
             headers=self.headers,
             json={
                 "query": query,
                 "limit": limit,
-            }
+            },
+            timeout=_ALBERT_TIMEOUT,
         )
 
         return r.json().get("data", [])
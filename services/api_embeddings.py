@@ -1,9 +1,14 @@
 """Service d'embeddings utilisant l'API OpenAI/Albert."""
-from typing import List, Union
+from typing import List, Union, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 import numpy as np
+import threading
 
 from config.settings import BASE_URL, API_KEY
+from services.llm import get_http_client, OPENAI_TIMEOUT
+from config.rag_config import get_rag_config
 
 
 class APIEmbeddingService:
@@ -18,8 +23,14 @@ class APIEmbeddingService:
         """
         self.client = client or OpenAI(
             base_url=BASE_URL,
-            api_key=API_KEY
+            api_key=API_KEY,
+            http_client=get_http_client(),
+            timeout=OPENAI_TIMEOUT
         )
+        # Cache LRU des embeddings de requêtes : (modèle, requête) -> embedding
+        # (verrou : instance partagée entre les sessions Streamlit)
+        self._query_cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
 
     def encode(
         self,
@@ -36,7 +47,7 @@ class APIEmbeddingService:
             dimensions: Nombre de dimensions (optionnel)
 
         Returns:
-            Embedding(s) sous forme de liste ou array numpy
+            Embedding (liste) pour un texte, array numpy float32 pour une liste
         """
         # Normaliser l'entrée en liste
         is_single = isinstance(texts, str)
@@ -55,15 +66,21 @@ class APIEmbeddingService:
         # Appel API
         try:
             response = self.client.embeddings.create(**params)
+            data = response.data
 
-            # Extraire les embeddings
-            embeddings = [item.embedding for item in response.data]
-
-            # Retourner selon le format d'entrée
+            # Requête unique : la liste est passée telle quelle à Qdrant
             if is_single:
-                return embeddings[0]
-            else:
-                return np.array(embeddings)
+                return data[0].embedding
+
+            # Plusieurs textes : remplir directement un array float32
+            if not data:
+                return np.empty((0, 0), dtype=np.float32)
+
+            embeddings = np.empty((len(data), len(data[0].embedding)), dtype=np.float32)
+            for i, item in enumerate(data):
+                embeddings[i] = item.embedding
+
+            return embeddings
 
         except Exception as e:
             raise RuntimeError(f"Erreur lors de l'embedding API: {e}")
@@ -79,33 +96,90 @@ class APIEmbeddingService:
         Returns:
             Embedding de la requête
         """
-        return self.encode(query, model)
+        key = (model, query)
+        with self._cache_lock:
+            cached = self._query_cache.get(key)
+            if cached is not None:
+                self._query_cache.move_to_end(key)
+                return cached
+
+        embedding = self.encode(query, model)
+
+        performance = get_rag_config().performance
+        if performance.use_cache:
+            with self._cache_lock:
+                self._query_cache[key] = embedding
+                while len(self._query_cache) > performance.cache_size:
+                    self._query_cache.popitem(last=False)
+
+        return embedding
+
+    def invalidate_cache(self, model: Optional[str] = None):
+        """
+        Vide le cache des embeddings de requêtes.
+
+        Args:
+            model: Ne vider que les entrées de ce modèle (None = tout vider)
+        """
+        with self._cache_lock:
+            if model is None:
+                self._query_cache.clear()
+                return
+
+            for key in [k for k in self._query_cache if k[0] == model]:
+                del self._query_cache[key]
 
     def encode_batch(
         self,
         texts: List[str],
         model: str,
-        batch_size: int = 32
+        batch_size: int = 32,
+        max_concurrency: int = 8
     ) -> np.ndarray:
         """
-        Encode un lot de textes par batches.
+        Encode un lot de textes par batches envoyés en parallèle.
+
+        Les textes identiques ne sont encodés qu'une fois. Le client OpenAI
+        est partagé entre les threads (même pool de connexions).
 
         Args:
             texts: Liste de textes
             model: ID du modèle
             batch_size: Taille des batches
+            max_concurrency: Nombre maximum de requêtes simultanées
 
         Returns:
-            Array numpy des embeddings
+            Array numpy des embeddings (dans l'ordre de texts)
         """
-        all_embeddings = []
-
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            embeddings = self.encode(batch, model)
-            all_embeddings.extend(embeddings if isinstance(embeddings, list) else embeddings.tolist())
-
-        return np.array(all_embeddings)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Dédupliquer en conservant l'ordre de première apparition
+        unique_texts = list(dict.fromkeys(texts))
+        batches = [
+            unique_texts[i:i + batch_size]
+            for i in range(0, len(unique_texts), batch_size)
+        ]
+
+        if len(batches) == 1:
+            batch_embeddings = [self.encode(batches[0], model)]
+        else:
+            workers = min(max_concurrency, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # map() conserve l'ordre des batches
+                batch_embeddings = list(executor.map(
+                    lambda batch: self.encode(batch, model),
+                    batches
+                ))
+
+        unique_embeddings = np.concatenate(batch_embeddings, axis=0)
+
+        if len(unique_texts) == len(texts):
+            return unique_embeddings
+
+        # Réassocier chaque texte à son embedding
+        position = {text: i for i, text in enumerate(unique_texts)}
+        return unique_embeddings[[position[text] for text in texts]]
 
 
 # Instance globale (singleton)
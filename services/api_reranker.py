@@ -1,41 +1,124 @@
 """Service de reranking utilisant l'API OpenAI/Albert."""
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Union
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
-import requests
+import hashlib
+import threading
+import time
+import httpx
+import numpy as np
 
-from config.settings import BASE_URL, API_KEY
+from config.settings import BASE_URL, API_KEY, settings
+from config.rag_config import get_rag_config
+from services.llm import get_http_client, OPENAI_TIMEOUT
 
-# Debug : afficher la config au démarrage
-print(f"🔧 Config Reranker API:")
-print(f"   BASE_URL: {BASE_URL}")
-print(f"   API_KEY: {'✅ définie' if API_KEY else '❌ manquante'}")
+# Décodage JSON rapide des réponses (json standard en repli)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Nouvelles tentatives sur erreurs transitoires (réseau, 429, 5xx)
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_MAX_RETRIES = 3
+_BACKOFF_FACTOR = 0.3
+_RERANK_TIMEOUT = httpx.Timeout(30.0, connect=3.05)
+
+# Appels /rerank simultanés, toutes sessions confondues (limite de l'API par clé)
+_RERANK_SEMAPHORE = threading.BoundedSemaphore(max(1, settings.albert_max_concurrency))
 
 
 class APIRerankerService:
     """Service de reranking via API."""
 
-    def __init__(self, client: OpenAI = None):
+    def __init__(self, client: OpenAI = None, max_workers: int = 10):
         """
         Initialise le service de reranking.
 
         Args:
             client: Client OpenAI (optionnel)
+            max_workers: Nombre maximal d'appels simultanés dans predict()
         """
         self.client = client or OpenAI(
             base_url=BASE_URL,
-            api_key=API_KEY
+            api_key=API_KEY,
+            http_client=get_http_client(),
+            timeout=OPENAI_TIMEOUT
         )
         self.api_key = API_KEY
+        self.max_workers = max(1, max_workers)
+        # Cache LRU des résultats : (modèle, top_n, return_documents, empreinte) -> résultats
+        # (verrou : predict() appelle rerank() depuis plusieurs threads)
+        self._cache: "OrderedDict[Tuple[str, int, Optional[bool], bytes], List[Dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         # ✅ Construire l'URL complète pour le reranking
         # BASE_URL = https://albert.api.etalab.gouv.fr/v1/
         self.rerank_url = BASE_URL.rstrip('/') + '/rerank'
+        # Pool HTTP partagé (connexions keep-alive réutilisées entre appels)
+        self.http = get_http_client()
+        # Headers avec authentification (construits une seule fois)
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def _post_with_retry(self, params: Dict) -> httpx.Response:
+        """POST vers l'endpoint de reranking avec backoff exponentiel."""
+        for attempt in range(_MAX_RETRIES + 1):
+            last_attempt = attempt == _MAX_RETRIES
+            try:
+                # Le sémaphore n'est pas conservé pendant l'attente du backoff
+                with _RERANK_SEMAPHORE:
+                    response = self.http.post(
+                        self.rerank_url,
+                        json=params,
+                        headers=self.headers,
+                        timeout=_RERANK_TIMEOUT
+                    )
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in _RETRY_STATUSES or last_attempt:
+                    return response
+
+            time.sleep(_BACKOFF_FACTOR * (2 ** attempt))
+
+    @staticmethod
+    def _fingerprint(query: str, documents: List[str]) -> bytes:
+        """Empreinte compacte de la requête et des documents (clé de cache)."""
+        digest = hashlib.blake2b(digest_size=16)
+        for text in (query, *documents):
+            # Préfixe de longueur : ["a", "b"] et ["a\x00b"] ne se confondent pas
+            data = text.encode("utf-8")
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.digest()
+
+    def invalidate_cache(self, model: Optional[str] = None):
+        """
+        Vide le cache des résultats de reranking.
+
+        Args:
+            model: Ne vider que les entrées de ce modèle (None = tout vider)
+        """
+        with self._cache_lock:
+            if model is None:
+                self._cache.clear()
+                return
+
+            for key in [k for k in self._cache if k[0] == model]:
+                del self._cache[key]
 
     def rerank(
         self,
         query: str,
         documents: List[str],
         model: str,
-        top_n: int = None
+        top_n: int = None,
+        return_documents: Optional[bool] = None
     ) -> List[Dict]:
         """
         Rerank des documents selon leur pertinence par rapport à la requête.
@@ -45,6 +128,9 @@ class APIRerankerService:
             documents: Liste de textes à reranker
             model: ID du modèle de reranking
             top_n: Nombre de résultats à retourner (0 ou None = tous)
+            return_documents: Si False, demande à l'API de ne pas renvoyer le
+                texte des documents (réponse plus légère) ; None = ne pas
+                envoyer le paramètre (comportement par défaut de l'API)
 
         Returns:
             Liste de dicts avec index, score et relevance_score
@@ -65,27 +151,27 @@ class APIRerankerService:
         else:
             params["top_n"] = 0  # Retourner tous les résultats par défaut
 
-        # Headers avec authentification
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        if return_documents is not None:
+            params["return_documents"] = return_documents
+
+        key = (model, params["top_n"], return_documents, self._fingerprint(query, documents))
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return list(cached)
 
         try:
-            # Debug temporaire
-            print(f"\n🔍 DEBUG Rerank:")
-            print(f"   URL complète: {self.rerank_url}")
-            print(f"   Model: {model}")
-            print(f"   Query: {query[:50]}...")
-            print(f"   Documents: {len(documents)}")
-
-            # ✅ Utiliser requests directement pour plus de contrôle
-            response = requests.post(
-                self.rerank_url,
-                json=params,
-                headers=headers,
-                timeout=30
-            )
+            # Debug (désactivé par défaut : rien n'est formaté ni écrit)
+            if get_rag_config().debug.show_rerank_requests:
+                print(f"\n🔍 DEBUG Rerank:")
+                print(f"   URL complète: {self.rerank_url}")
+                print(f"   Model: {model}")
+                print(f"   Query: {query[:50]}...")
+                print(f"   Documents: {len(documents)}")
+
+            # ✅ Appel HTTP direct (pool partagé) pour plus de contrôle
+            response = self._post_with_retry(params)
 
             if response.status_code != 200:
                 raise RuntimeError(
@@ -93,7 +179,7 @@ class APIRerankerService:
                     f"{response.text}"
                 )
 
-            data = response.json()
+            data = orjson.loads(response.content) if ORJSON_AVAILABLE else response.json()
 
             # ✅ Albert retourne 'results'
             results = data.get("results", data.get("data", []))
@@ -107,9 +193,16 @@ class APIRerankerService:
                     "document": r.get("document", "")
                 })
 
-            return normalized_results
+            performance = get_rag_config().performance
+            if performance.use_cache:
+                with self._cache_lock:
+                    self._cache[key] = normalized_results
+                    while len(self._cache) > performance.cache_size:
+                        self._cache.popitem(last=False)
 
-        except requests.exceptions.RequestException as e:
+            return list(normalized_results)
+
+        except httpx.HTTPError as e:
             raise RuntimeError(f"Erreur de connexion lors du reranking API: {e}")
         except Exception as e:
             raise RuntimeError(f"Erreur lors du reranking API: {e}")
@@ -118,54 +211,103 @@ class APIRerankerService:
         self,
         pairs: List[Tuple[str, str]],
         model: str,
-        convert_to_numpy: bool = False
-    ) -> List[float]:
+        convert_to_numpy: bool = False,
+        max_rerank_docs: Optional[int] = None,
+        prior_scores: Optional[List[float]] = None,
+        single_doc_score: Optional[float] = None
+    ) -> Union[List[float], np.ndarray]:
         """
         Prédit les scores de pertinence pour des paires (query, document).
         Compatible avec l'interface du CrossEncoder local.
 
+        Reranking en deux étapes (comme reRankDocs de Solr) : avec
+        max_rerank_docs, seuls les meilleurs candidats de chaque requête
+        (selon prior_scores, sinon dans l'ordre reçu) sont envoyés à l'API ;
+        les autres conservent leur score initial (0.0 sans prior_scores).
+        Moins de données envoyées, au prix de ne jamais remonter un document
+        de la queue.
+
         Args:
             pairs: Liste de tuples (query, document)
             model: ID du modèle
-            convert_to_numpy: Ignoré (pour compatibilité)
+            convert_to_numpy: Retourner un array numpy float32 (comme le CrossEncoder)
+            max_rerank_docs: Nombre maximal de documents rerankés par requête
+            prior_scores: Scores initiaux des paires (même ordre que pairs)
+            single_doc_score: Score attribué sans appel API quand une requête
+                n'a qu'un seul document distinct (None = toujours appeler l'API)
 
         Returns:
-            Liste de scores de pertinence
+            Scores de pertinence (liste, ou array si convert_to_numpy)
         """
+        # float64 pour la liste : les scores de l'API sont restitués à l'identique
+        dtype = np.float32 if convert_to_numpy else np.float64
+
         if not pairs:
-            return []
+            return np.empty(0, dtype=dtype) if convert_to_numpy else []
 
         # Grouper par query (optimisation si même query)
-        query_groups = {}
+        query_groups = defaultdict(list)
         for i, (query, doc) in enumerate(pairs):
-            if query not in query_groups:
-                query_groups[query] = []
             query_groups[query].append((i, doc))
 
-        # Préparer les résultats
-        scores = [0.0] * len(pairs)
+        # Préparer les résultats (array préalloué)
+        if prior_scores is not None:
+            scores = np.array(prior_scores, dtype=dtype)
+        else:
+            scores = np.zeros(len(pairs), dtype=dtype)
 
         # Reranker par groupe de query
-        for query, items in query_groups.items():
-            indices = [i for i, _ in items]
-            documents = [doc for _, doc in items]
+        def rerank_group(query: str, items: List[Tuple[int, str]]) -> None:
+            if max_rerank_docs and len(items) > max_rerank_docs:
+                if prior_scores is not None:
+                    items = sorted(items, key=lambda item: prior_scores[item[0]], reverse=True)
+                items = items[:max_rerank_docs]
+
+            # Documents identiques envoyés une seule fois
+            positions: Dict[str, List[int]] = {}
+            for i, doc in items:
+                positions.setdefault(doc, []).append(i)
+            documents = list(positions)
 
             try:
                 results = self.rerank(query, documents, model, top_n=0)
 
-                # Mapper les scores aux indices originaux
+                # Mapper les scores aux indices originaux (indices disjoints par groupe)
                 for result in results:
                     doc_idx = result.get("index", 0)
-                    if doc_idx < len(indices):
-                        original_idx = indices[doc_idx]
+                    if doc_idx < len(documents):
                         score = result.get("relevance_score", 0.0)
-                        scores[original_idx] = score
+                        for original_idx in positions[documents[doc_idx]]:
+                            scores[original_idx] = score
 
             except Exception as e:
                 print(f"⚠️ Erreur reranking pour query '{query[:50]}...': {e}")
-                continue
 
-        return scores
+        # Groupes à un seul document distinct : score fixe sans appel réseau
+        if single_doc_score is not None:
+            pending = {}
+            for query, items in query_groups.items():
+                if all(doc == items[0][1] for _, doc in items):
+                    for i, _ in items:
+                        scores[i] = single_doc_score
+                else:
+                    pending[query] = items
+            query_groups = pending
+
+        if not query_groups:
+            return scores if convert_to_numpy else scores.tolist()
+
+        # Un seul groupe : appel direct, sinon appels réseau concurrents
+        if len(query_groups) == 1:
+            rerank_group(*next(iter(query_groups.items())))
+            return scores if convert_to_numpy else scores.tolist()
+
+        max_workers = min(self.max_workers, len(query_groups))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # list() attend la fin de tous les groupes
+            list(executor.map(rerank_group, query_groups.keys(), query_groups.values()))
+
+        return scores if convert_to_numpy else scores.tolist()
 
 
 # Instance globale (singleton)
@@ -1,11 +1,18 @@
 """Service de gestion des collections RAG (locales et distantes)."""
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
-import os
+import httpx
 
-from config.settings import ENABLE_REMOTE_COLLECTIONS
-from services.qdrant import qdrant_available, qdrant_collections
+from config.settings import ENABLE_REMOTE_COLLECTIONS, API_KEY
+from services.qdrant import is_qdrant_available, get_qdrant_collections, reset_qdrant_cache
+from services.llm import get_http_client
+from services.rag_remote import invalidate_collection_cache
+from services.model_detector import invalidate_model_detections
+
+# Échec rapide si l'API est injoignable (connexion), lecture plus tolérante
+_COLLECTIONS_TIMEOUT = httpx.Timeout(10.0, connect=3.05)
 
 
 @dataclass
@@ -33,6 +40,15 @@ class Collection:
         return self.name.endswith("files_hashes")
 
 
+def clear_collection_caches():
+    """Oublie les collections mémorisées : le prochain chargement les relit."""
+    reset_qdrant_cache()
+    # Une collection distante recréée sous le même nom change d'ID
+    invalidate_collection_cache()
+    # Une collection locale réindexée peut changer de modèle d'embedding
+    invalidate_model_detections()
+
+
 class CollectionManager:
     """Gestionnaire unifié des collections locales et distantes."""
 
@@ -44,8 +60,14 @@ class CollectionManager:
             openai_client: Client OpenAI pour accéder aux collections distantes
         """
         self.openai_client = openai_client
+        # Pool HTTP partagé : appels REST directs, sans passer par le SDK OpenAI
+        self.http = get_http_client()
         self._local_collections: List[Collection] = []
         self._remote_collections: List[Collection] = []
+        # Index reconstruits à chaque chargement
+        self._by_name: Dict[str, Collection] = {}
+        self._visible_collections: List[Collection] = []
+        self._display_names: List[str] = []
 
         # Charger les collections
         self._load_collections()
@@ -53,11 +75,11 @@ class CollectionManager:
     def _load_collections(self):
         """Charge toutes les collections disponibles."""
         # Collections locales (Qdrant)
-        if qdrant_available:
+        if is_qdrant_available():
+            # get_qdrant_collections() exclut déjà les collections de hashes
             self._local_collections = [
                 Collection(name=name, source="local")
-                for name in qdrant_collections
-                if not name.endswith("files_hashes")  # Filtrer les collections de hashes
+                for name in get_qdrant_collections()
             ]
 
         # Collections distantes (Albert)
@@ -68,57 +90,111 @@ class CollectionManager:
                 print(f"⚠️ Erreur chargement collections distantes : {e}")
                 self._remote_collections = []
 
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """Construit l'index par nom et les listes servies aux lectures."""
+        all_cols = self._local_collections + self._remote_collections
+
+        # Doublon local/distant : la collection locale l'emporte, comme avant
+        self._by_name = {}
+        for col in all_cols:
+            self._by_name.setdefault(col.name, col)
+
+        self._visible_collections = [col for col in all_cols if not col.is_hash_collection]
+        self._display_names = [col.display_name for col in self._visible_collections]
+
+    def _fetch_remote_page(self, offset: int, limit: int, headers: Dict[str, str]) -> Dict:
+        """Récupère une page de /collections (payload JSON)."""
+        response = self.http.get(
+            "/collections",
+            params={"offset": offset, "limit": limit},
+            headers=headers,
+            timeout=_COLLECTIONS_TIMEOUT,
+        )
+        return response.json()
+
+    @staticmethod
+    def _to_remote_collections(batch: List[Dict]) -> List[Collection]:
+        """Convertit une page de l'API en collections (sans les collections de hashes)."""
+        collections = []
+        for col in batch:
+            collection_name = col.get("name", "")
+
+            # Filtrer les collections de hashes
+            if collection_name.endswith("files_hashes"):
+                continue
+
+            collections.append(Collection(
+                name=collection_name,
+                source="remote",
+                id=col.get("id"),
+                visibility=col.get("visibility"),
+                created_at=col.get("created_at"),
+                updated_at=col.get("updated_at"),
+                metadata=col
+            ))
+        return collections
+
     def _fetch_remote_collections(self) -> List[Collection]:
         """
         Récupère les collections distantes depuis l'API Albert.
 
+        Si la première page indique le nombre total de collections, les pages
+        suivantes sont demandées en parallèle ; sinon elles sont parcourues
+        une à une jusqu'à une page vide.
+
         Returns:
             Liste des collections distantes (sans les collections de hashes)
         """
-        collections = []
-        offset = 0
         limit = 100
 
-        # Récupérer l'API key depuis les variables d'environnement
-        api_key = os.getenv("API-KEY")
-
         # Construire les headers avec l'API key
         headers = {
-            "Authorization": f"Bearer {api_key}",
+            "Authorization": f"Bearer {API_KEY}",
         }
 
+        try:
+            payload = self._fetch_remote_page(0, limit, headers)
+        except Exception as e:
+            print(f"⚠️ Erreur lors de la récupération des collections : {e}")
+            return []
+
+        batch = payload.get("data", [])
+        if not batch:
+            return []
+
+        collections = self._to_remote_collections(batch)
+        total = payload.get("total")
+
+        if isinstance(total, int):
+            offsets = list(range(limit, total, limit))
+            if not offsets:
+                return collections
+
+            def fetch_batch(offset: int) -> List[Dict]:
+                try:
+                    return self._fetch_remote_page(offset, limit, headers).get("data", [])
+                except Exception as e:
+                    print(f"⚠️ Erreur lors de la récupération des collections : {e}")
+                    return []
+
+            with ThreadPoolExecutor(max_workers=min(8, len(offsets))) as executor:
+                # map() conserve l'ordre des pages
+                for page in executor.map(fetch_batch, offsets):
+                    collections.extend(self._to_remote_collections(page))
+            return collections
+
+        # Pas de total : pagination séquentielle
+        offset = limit
         while True:
             try:
-                response = self.openai_client._client.request(
-                    method="GET",
-                    url="/collections",
-                    params={"offset": offset, "limit": limit},
-                    headers=headers,
-                )
-
-                payload = response.json()
-                batch = payload.get("data", [])
+                batch = self._fetch_remote_page(offset, limit, headers).get("data", [])
 
                 if not batch:
                     break
 
-                for col in batch:
-                    collection_name = col.get("name", "")
-
-                    # Filtrer les collections de hashes
-                    if collection_name.endswith("files_hashes"):
-                        continue
-
-                    collections.append(Collection(
-                        name=collection_name,
-                        source="remote",
-                        id=col.get("id"),
-                        visibility=col.get("visibility"),
-                        created_at=col.get("created_at"),
-                        updated_at=col.get("updated_at"),
-                        metadata=col
-                    ))
-
+                collections.extend(self._to_remote_collections(batch))
                 offset += limit
 
             except Exception as e:
@@ -137,13 +213,11 @@ class CollectionManager:
         Returns:
             Liste de toutes les collections
         """
-        all_cols = self._local_collections + self._remote_collections
-
         if include_hash_collections:
-            return all_cols
+            return self._local_collections + self._remote_collections
 
-        # Par défaut, filtrer les collections de hashes
-        return [col for col in all_cols if not col.is_hash_collection]
+        # Par défaut, sans les collections de hashes (liste précalculée)
+        return list(self._visible_collections)
 
     def get_local_collections(self, include_hash_collections: bool = False) -> List[Collection]:
         """
@@ -183,10 +257,7 @@ class CollectionManager:
         clean_name = name.replace("☁️ ", "").replace("💾 ", "").strip()
 
         # Rechercher dans toutes les collections (y compris les hashes)
-        for col in self.get_all_collections(include_hash_collections=True):
-            if col.name == clean_name:
-                return col
-        return None
+        return self._by_name.get(clean_name)
 
     def get_collection_names(self) -> List[str]:
         """
@@ -197,10 +268,11 @@ class CollectionManager:
         Returns:
             Liste des noms avec indicateurs de source
         """
-        return [col.display_name for col in self.get_all_collections()]
+        return list(self._display_names)
 
     def reload(self):
-        """Recharge toutes les collections."""
+        """Recharge toutes les collections, caches de module compris."""
+        clear_collection_caches()
         self._load_collections()
 
     def is_remote_collection(self, collection_name: str) -> bool:
@@ -226,5 +298,5 @@ class CollectionManager:
         return {
             "local": len(self._local_collections),
             "remote": len(self._remote_collections),
-            "total": len(self.get_all_collections())
+            "total": len(self._visible_collections)
         }
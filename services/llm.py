@@ -1,7 +1,20 @@
 """Service LLM avec support OpenAI uniquement."""
 from openai import OpenAI
-from typing import Dict, Optional, Callable
-import yaml
+from typing import Dict, List, Optional, Callable, Tuple
+import atexit
+import re
+import time
+import weakref
+import httpx
+
+from config.yaml_loader import load_yaml
+
+# HTTP/2 (multiplexage) si le paquet h2 est installé, HTTP/1.1 keep-alive sinon
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 from config.settings import BASE_URL, API_KEY
 
@@ -28,17 +41,71 @@ def set_llm_logger(logger: LLMLogger):
     _llm_logger = logger
 
 
+# Durée de validité de la liste des modèles (secondes)
+_MODELS_TTL = 300
+
+# Cache des modèles par client : client -> (horodatage, {model_id: capacités})
+_models_cache: "weakref.WeakKeyDictionary[OpenAI, Tuple[float, Dict[str, Dict[str, bool]]]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Règles de capacités compilées : (règles sources, [(capacité, motif)])
+_compiled_rules: Optional[Tuple[dict, List[Tuple[str, "re.Pattern"]]]] = None
+
+# Pool de connexions HTTP partagé par tous les clients de l'API
+_http_client: Optional[httpx.Client] = None
+
+# Timeout des clients OpenAI (celui du SDK) : sans lui, ils héritent du
+# défaut court du pool et les réponses longues seraient coupées
+OPENAI_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Retourne le client HTTP partagé (singleton).
+
+    Les connexions TLS restent ouvertes entre les appels (LLM, embeddings,
+    reranking, collections) au lieu d'un pool distinct par client OpenAI.
+    Les URL relatives sont résolues par rapport à BASE_URL.
+
+    Returns:
+        Client httpx partagé
+    """
+    global _http_client
+
+    if _http_client is None:
+        _http_client = httpx.Client(
+            base_url=BASE_URL,
+            http2=HTTP2_AVAILABLE,
+            follow_redirects=True,
+            # Défaut explicite (httpx : 5 s) pour les appels directs sans timeout ;
+            # les clients OpenAI reçoivent OPENAI_TIMEOUT à leur construction
+            timeout=httpx.Timeout(60.0, connect=3.05),
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=32,
+                keepalive_expiry=60
+            )
+        )
+        # Libérer les sockets à la fermeture du processus
+        atexit.register(_http_client.close)
+
+    return _http_client
+
+
 def get_llm_client() -> OpenAI:
     """
     Crée et retourne un client OpenAI.
 
     Returns:
-        Instance du client OpenAI
+        Instance du client OpenAI (pool HTTP partagé)
     """
     _llm_logger.info(f"🌐 Client OpenAI initialisé - {BASE_URL}")
     return OpenAI(
         base_url=BASE_URL,
-        api_key=API_KEY
+        api_key=API_KEY,
+        http_client=get_http_client(),
+        timeout=OPENAI_TIMEOUT
     )
 
 
@@ -53,8 +120,8 @@ def load_capability_rules(path: str = "model_capabilities.yaml") -> dict:
         Dictionnaire des règles de capacités
     """
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f)["capabilities"]
+        # Relu uniquement si le fichier a été modifié
+        return load_yaml(path)["capabilities"]
     except Exception as e:
         _llm_logger.error(f"Erreur chargement règles capacités : {e}")
         return {}
@@ -64,12 +131,58 @@ def list_available_models(client: OpenAI) -> Dict[str, Dict[str, bool]]:
     """
     Liste les modèles disponibles et détecte leurs capacités.
 
+    Le résultat est mémorisé par client pendant quelques minutes
+    (voir invalidate_llm_caches pour forcer un rafraîchissement).
+    Il est partagé entre appels : ne pas le modifier.
+
     Args:
         client: Client OpenAI
 
     Returns:
         Dictionnaire {model_id: {capability: bool}}
     """
+    cached = _models_cache.get(client)
+    if cached is not None and time.monotonic() - cached[0] < _MODELS_TTL:
+        return cached[1]
+
+    models = _fetch_available_models(client)
+    # Une liste vide (API injoignable) n'est pas mémorisée
+    if models:
+        _models_cache[client] = (time.monotonic(), models)
+
+    return models
+
+
+def invalidate_llm_caches():
+    """Oublie les listes de modèles mémorisées (rechargées au prochain appel)."""
+    _models_cache.clear()
+
+
+def _compile_capability_rules(rules: dict) -> List[Tuple[str, "re.Pattern"]]:
+    """
+    Compile les mots-clés de chaque capacité en une seule expression régulière.
+
+    Les règles étant mises en cache par load_yaml, la compilation n'est
+    refaite que si le fichier de règles a changé.
+    """
+    global _compiled_rules
+
+    if _compiled_rules is not None and _compiled_rules[0] is rules:
+        return _compiled_rules[1]
+
+    compiled = []
+    for cap, rule in rules.items():
+        keywords = rule.get("keywords", [])
+        if keywords:
+            # Sous-chaîne sensible à la casse, comme `k in mid`
+            compiled.append((cap, re.compile("|".join(re.escape(str(k)) for k in keywords))))
+
+    _compiled_rules = (rules, compiled)
+    return compiled
+
+
+def _fetch_available_models(client: OpenAI) -> Dict[str, Dict[str, bool]]:
+    """Interroge l'API et applique les règles de capacités."""
     models = {}
 
     try:
@@ -84,6 +197,8 @@ def list_available_models(client: OpenAI) -> Dict[str, Dict[str, bool]]:
         _llm_logger.error(f"Erreur récupération modèles : {e}")
         return models
 
+    compiled_rules = _compile_capability_rules(rules)
+
     for m in response.data:
         mid = m.id.lower()
         caps = {}
@@ -94,10 +209,9 @@ def list_available_models(client: OpenAI) -> Dict[str, Dict[str, bool]]:
             for cap, value in capabilities.items():
                 caps[cap.lower()] = bool(value)
 
-        # Détection via règles YAML
-        for cap, rule in rules.items():
-            keywords = rule.get("keywords", [])
-            if any(k in mid for k in keywords):
+        # Détection via règles YAML (une alternation compilée par capacité)
+        for cap, pattern in compiled_rules:
+            if pattern.search(mid):
                 caps[cap] = True
 
         if caps:
@@ -1,8 +1,17 @@
 """Service de détection des modèles d'embedding dans les collections."""
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from openai import OpenAI
-from services.qdrant import qdrant_client, qdrant_available
+import re
+import time
+from services.qdrant import get_qdrant_client, is_qdrant_available
 from config.settings import BASE_URL, API_KEY
+from services.llm import get_http_client, OPENAI_TIMEOUT
+
+# Durée de validité d'une détection (le schéma d'une collection change rarement)
+_DETECTION_TTL = 300
+
+# Mots-clés des noms de modèles d'embedding
+_EMBEDDING_NAME_RE = re.compile(r"embed|bge|e5|gte")
 
 
 class ModelDetector:
@@ -17,9 +26,13 @@ class ModelDetector:
         """
         self.openai_client = openai_client or OpenAI(
             base_url=BASE_URL,
-            api_key=API_KEY
+            api_key=API_KEY,
+            http_client=get_http_client(),
+            timeout=OPENAI_TIMEOUT
         )
         self._available_models_cache = None
+        # Cache des détections : collection -> (horodatage, résultat)
+        self._detection_cache: Dict[str, Tuple[float, Dict]] = {}
 
     def get_available_embedding_models(self) -> List[str]:
         """
@@ -51,7 +64,7 @@ class ModelDetector:
                         continue
 
                 # Sinon, détecter par le nom
-                if any(keyword in model_id for keyword in ['embed', 'bge', 'e5', 'gte']):
+                if _EMBEDDING_NAME_RE.search(model_id):
                     embedding_models.append(model.id)
 
             self._available_models_cache = embedding_models
@@ -72,12 +85,38 @@ class ModelDetector:
             Dict avec 'model_label', 'dimension', 'is_compatible'
             ou None si impossible à détecter
         """
-        if not qdrant_available:
+        if not is_qdrant_available():
             return None
 
+        cached = self._detection_cache.get(collection_name)
+        if cached is not None and time.monotonic() - cached[0] < _DETECTION_TTL:
+            return cached[1]
+
+        detection = self._detect_collection_model(collection_name)
+
+        # Les erreurs (collection vide, Qdrant injoignable...) ne sont pas mémorisées
+        if not detection.get('error'):
+            self._detection_cache[collection_name] = (time.monotonic(), detection)
+
+        return detection
+
+    def invalidate_cache(self, collection_name: Optional[str] = None):
+        """
+        Oublie les détections mémorisées.
+
+        Args:
+            collection_name: Collection à oublier (None = toutes)
+        """
+        if collection_name is None:
+            self._detection_cache.clear()
+        else:
+            self._detection_cache.pop(collection_name, None)
+
+    def _detect_collection_model(self, collection_name: str) -> Dict:
+        """Interroge Qdrant pour détecter le modèle d'une collection."""
         try:
             # Récupérer un point de la collection pour voir le modèle
-            points, _ = qdrant_client.scroll(
+            points, _ = get_qdrant_client().scroll(
                 collection_name=collection_name,
                 limit=1,
                 with_payload=True
@@ -100,7 +139,7 @@ class ModelDetector:
             )
 
             # Récupérer la dimension de la collection
-            collection_info = qdrant_client.get_collection(collection_name)
+            collection_info = get_qdrant_client().get_collection(collection_name)
             dimension = collection_info.config.params.vectors.size
 
             # Vérifier si le modèle est compatible
@@ -205,14 +244,29 @@ class ModelDetector:
         return None
 
 
+# Instance globale (singleton) : ses détections sont partagées
+_model_detector: Optional[ModelDetector] = None
+
+
 def create_model_detector(openai_client: Optional[OpenAI] = None) -> ModelDetector:
     """
-    Factory pour créer un détecteur de modèles.
+    Récupère le détecteur de modèles partagé (créé au premier appel).
 
     Args:
-        openai_client: Client OpenAI (optionnel)
+        openai_client: Client OpenAI (optionnel, utilisé à la création)
 
     Returns:
         Instance de ModelDetector
     """
-    return ModelDetector(openai_client)
+    global _model_detector
+
+    if _model_detector is None:
+        _model_detector = ModelDetector(openai_client)
+
+    return _model_detector
+
+
+def invalidate_model_detections():
+    """Oublie les détections du détecteur partagé (s'il a été créé)."""
+    if _model_detector is not None:
+        _model_detector.invalidate_cache()
@@ -1,4 +1,6 @@
-import os
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
 
 try:
     from qdrant_client import QdrantClient
@@ -9,38 +11,151 @@ except ImportError:
 from config.settings import (
     QDRANT_HOST,
     QDRANT_PORT,
-    QDRANT_API_KEY
+    QDRANT_API_KEY,
+    settings
 )
 
-qdrant_available = False
-qdrant_client = None
-qdrant_collections = []
 
+def _create_client():
+    """Crée le client Qdrant (gRPC si QDRANT_PREFER_GRPC est activé)."""
+    grpc_options = {}
+    if settings.qdrant_prefer_grpc:
+        grpc_options = {"prefer_grpc": True, "grpc_port": settings.qdrant_grpc_port}
 
-if QdrantClient:
     try:
-        try:
-            qdrant_client = QdrantClient(
-                host=QDRANT_HOST,
-                port=QDRANT_PORT,
-                api_key=QDRANT_API_KEY
-            )
-        except Exception:
-            qdrant_client = QdrantClient(
-                url=f"http://{QDRANT_HOST}:{QDRANT_PORT}",
-                api_key=QDRANT_API_KEY
-            )
-
-        colls = qdrant_client.get_collections()
+        return QdrantClient(
+            host=QDRANT_HOST,
+            port=QDRANT_PORT,
+            api_key=QDRANT_API_KEY,
+            **grpc_options
+        )
+    except Exception:
+        return QdrantClient(
+            url=f"http://{QDRANT_HOST}:{QDRANT_PORT}",
+            api_key=QDRANT_API_KEY,
+            **grpc_options
+        )
+
+
+# Délai avant une nouvelle tentative de connexion après un échec (secondes)
+_RETRY_DELAY = 30
+
+# Client Qdrant, conservé même quand les collections sont relues
+_client = None
+# Collections : (toutes, interrogeables, disponibilité), mémorisées après un
+# succès ; un échec n'est retenu que _RETRY_DELAY secondes
+_state: Optional[Tuple[Tuple[str, ...], Tuple[str, ...], bool]] = None
+_failed_at = 0.0
+_state_lock = threading.Lock()
+
+
+def _load_collections() -> Tuple[Tuple[str, ...], Tuple[str, ...], bool]:
+    """
+    Connexion à Qdrant (si besoin) et liste des collections.
+
+    Returns:
+        (toutes les collections, collections interrogeables, disponibilité)
+    """
+    global _client
+
+    try:
+        if _client is None:
+            _client = _create_client()
+
+        colls = _client.get_collections()
         if hasattr(colls, "collections"):
-            qdrant_collections = [c.name for c in colls.collections]
+            all_collections = tuple(c.name for c in colls.collections)
         else:
-            qdrant_collections = [c["name"] for c in colls["collections"]]
+            all_collections = tuple(c["name"] for c in colls["collections"])
 
-        qdrant_available = True
+        # Collections de hashes filtrées une fois pour toutes
+        queryable = tuple(
+            name for name in all_collections
+            if not name.endswith("files_hashes")
+        )
+        return all_collections, queryable, True
 
     except Exception:
-        qdrant_available = False
+        return (), (), False
+
+
+def _bootstrap() -> Tuple[Tuple[str, ...], Tuple[str, ...], bool]:
+    """Collections Qdrant, chargées au premier usage puis mémorisées."""
+    global _state, _failed_at
+
+    if not QdrantClient:
+        return (), (), False
+
+    with _state_lock:
+        if _state is None or (
+            not _state[2] and time.monotonic() - _failed_at >= _RETRY_DELAY
+        ):
+            _state = _load_collections()
+            if not _state[2]:
+                _failed_at = time.monotonic()
+        return _state
+
+
+def reset_qdrant_cache():
+    """Oublie les collections (et un échec de connexion) : relues au prochain accès."""
+    global _state
+
+    with _state_lock:
+        _state = None
+
+
+def get_qdrant_client():
+    """Retourne le client Qdrant (None si qdrant-client n'est pas installé)."""
+    _bootstrap()
+    return _client
+
+
+def is_qdrant_available() -> bool:
+    """Indique si Qdrant a répondu lors de la connexion."""
+    return _bootstrap()[2]
+
+
+def get_all_qdrant_collections() -> Tuple[str, ...]:
+    """Toutes les collections (y compris *files_hashes), pour l'administration."""
+    return _bootstrap()[0]
+
+
+def get_qdrant_collections() -> Tuple[str, ...]:
+    """Collections interrogeables (sans les collections de hashes)."""
+    return _bootstrap()[1]
+
+
+# Anciens noms de module (résolus paresseusement, préférer les fonctions)
+_LEGACY_ACCESSORS = {
+    "qdrant_client": get_qdrant_client,
+    "qdrant_available": is_qdrant_available,
+    "qdrant_collections": get_qdrant_collections,
+    "qdrant_all_collections": get_all_qdrant_collections,
+}
+
+
+def __getattr__(name: str):
+    accessor = _LEGACY_ACCESSORS.get(name)
+    if accessor is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return accessor()
+
+
+def _to_docs(results) -> List[Dict]:
+    """Normalise des résultats Qdrant en dicts pour le RAG."""
+    docs = []
+
+    for r in results:
+        payload = r.payload or {}
+
+        docs.append({
+            "content": payload.get("content", ""),
+            "filename": payload.get("filename"),
+            "score": r.score
+        })
+
+    return docs
+
 
 # Plante sur qdrant-client >=1.6.0 A revoir pour plus tard
 def search_qdrant(query: str, collection: str, top_k: int = 20):
@@ -48,7 +163,8 @@ def search_qdrant(query: str, collection: str, top_k: int = 20):
     Recherche vectorielle simple dans Qdrant.
     Retourne une liste de dicts normalisés pour le RAG.
     """
-    if not qdrant_available or not qdrant_client:
+    qdrant_client = get_qdrant_client()
+    if not is_qdrant_available() or not qdrant_client:
         return []
 
     results = qdrant_client.search(
@@ -58,15 +174,51 @@ def search_qdrant(query: str, collection: str, top_k: int = 20):
         with_payload=True
     )
 
-    docs = []
+    return _to_docs(results)
 
-    for r in results:
-        payload = r.payload or {}
 
-        docs.append({
-            "content": payload.get("content", ""),
-            "filename": payload.get("filename"),
-            "score": r.score
-        })
+def search_qdrant_batch(
+    queries: List[Any],
+    collection: str,
+    top_k: int = 20
+) -> List[List[Dict]]:
+    """
+    Plusieurs recherches vectorielles dans une même collection en un seul appel.
 
-    return docs
+    Args:
+        queries: Vecteurs de requête
+        collection: Nom de la collection
+        top_k: Nombre de résultats par requête
+
+    Returns:
+        Une liste de dicts normalisés par requête (dans l'ordre de queries)
+    """
+    qdrant_client = get_qdrant_client()
+    if not queries:
+        return []
+    if not is_qdrant_available() or not qdrant_client:
+        return [[] for _ in queries]
+
+    if hasattr(qdrant_client, "query_batch_points"):
+        from qdrant_client.models import QueryRequest
+
+        responses = qdrant_client.query_batch_points(
+            collection_name=collection,
+            requests=[
+                QueryRequest(query=q, limit=top_k, with_payload=True)
+                for q in queries
+            ]
+        )
+        batches = [response.points for response in responses]
+    else:
+        from qdrant_client.models import SearchRequest
+
+        batches = qdrant_client.search_batch(
+            collection_name=collection,
+            requests=[
+                SearchRequest(vector=q, limit=top_k, with_payload=True)
+                for q in queries
+            ]
+        )
+
+    return [_to_docs(results) for results in batches]
@@ -1,11 +1,15 @@
 """RAG system with API embeddings and reranking - Version hybride complète."""
 from typing import List, Dict, Optional, Callable, Set, Tuple
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from openai import OpenAI
+import heapq
 import re
+import threading
 import html
 
-from services.qdrant import qdrant_client
+from services.qdrant import get_qdrant_client
 from services.api_embeddings import get_embedding_service
 from services.api_reranker import get_reranker_service
 from config.rag_config import get_rag_config
@@ -18,6 +22,27 @@ except ImportError:
     SPARSE_AVAILABLE = False
     print("⚠️  fastembed non installé, recherche hybride désactivée")
 
+# Moteur RE2 (temps linéaire) pour le surlignage, sinon module re standard
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+# Échappement HTML en un seul passage C (markupsafe, dépendance de streamlit)
+try:
+    from markupsafe import escape as _markup_escape
+    MARKUPSAFE_AVAILABLE = True
+except ImportError:
+    MARKUPSAFE_AVAILABLE = False
+
+# Tokenizer BPE pour le budget de tokens (sinon estimation ~4 caractères/token)
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
 
 class RAGLogger:
     """Logger abstrait pour le système RAG."""
@@ -38,6 +63,34 @@ _rag_logger = RAGLogger()
 
 # ✅ NOUVEAU : Modèle sparse global (chargé une seule fois)
 _sparse_model = None
+_sparse_model_lock = threading.Lock()
+
+# Expressions régulières du surlignage
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+# Entités produites par html.escape et par markupsafe
+_HTML_ENTITY_PATTERN = r"&(?:amp|lt|gt|quot|#x27|#39|#34);"
+
+# Encodeur tiktoken (chargé à la première estimation)
+_token_encoder = None
+_token_encoder_loaded = False
+_token_encoder_lock = threading.Lock()
+
+# Cache LRU des chunks Qdrant : (collection, filepath, chunk_id) -> chunk ou None
+# (verrou : partagé entre les sessions Streamlit)
+_chunk_cache: "OrderedDict[Tuple[str, str, int], Optional[Dict]]" = OrderedDict()
+_chunk_cache_lock = threading.Lock()
+
+# Cache LRU des sparse vectors de requêtes : texte -> (indices, valeurs)
+# (verrou : calculés depuis le pool de threads ci-dessous)
+_sparse_cache: "OrderedDict[str, Tuple[List[int], List[float]]]" = OrderedDict()
+_sparse_cache_lock = threading.Lock()
+
+# Threads pour calculer les vecteurs dense et sparse en parallèle
+_embedding_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-embedding")
+
+# Présence d'un vecteur sparse par collection (détectée une seule fois)
+_hybrid_support: Dict[str, bool] = {}
 
 
 def set_rag_logger(logger: RAGLogger):
@@ -59,80 +112,220 @@ def get_sparse_model():
         return None
 
     if _sparse_model is None:
-        _rag_logger.info("📦 Chargement du modèle sparse BM25...")
-        _sparse_model = SparseTextEmbedding(
-            model_name="Qdrant/bm25",
-            batch_size=32
-        )
-        _rag_logger.info("✅ Modèle sparse chargé")
+        # Verrou : le préchargement et une première requête peuvent se croiser
+        with _sparse_model_lock:
+            if _sparse_model is None:
+                _rag_logger.info("📦 Chargement du modèle sparse BM25...")
+                _sparse_model = SparseTextEmbedding(
+                    model_name="Qdrant/bm25",
+                    batch_size=32
+                )
+                _rag_logger.info("✅ Modèle sparse chargé")
 
     return _sparse_model
 
 
+def _preload_sparse_model():
+    """Charge le modèle sparse (thread d'arrière-plan)."""
+    try:
+        get_sparse_model()
+    except Exception as e:
+        # Hors du thread de l'UI : console uniquement
+        print(f"⚠️  Préchargement du modèle sparse échoué : {e}")
+
+
+def warm_up_sparse_model():
+    """
+    Lance le chargement du modèle sparse en arrière-plan.
+
+    Évite que la première recherche hybride attende le chargement
+    du modèle ONNX et du tokenizer.
+    """
+    if SPARSE_AVAILABLE and _sparse_model is None:
+        threading.Thread(
+            target=_preload_sparse_model,
+            name="rag-sparse-preload",
+            daemon=True
+        ).start()
+
+
 def generate_sparse_vector(text: str):
-    """Génère un sparse vector BM25 pour un texte."""
-    sparse_model = get_sparse_model()
+    """Génère un sparse vector BM25 pour un texte (mis en cache par texte)."""
+    with _sparse_cache_lock:
+        cached = _sparse_cache.get(text)
+        if cached is not None:
+            _sparse_cache.move_to_end(text)
 
-    if sparse_model is None:
-        return None
+    if cached is None:
+        sparse_model = get_sparse_model()
 
-    try:
-        # FastEmbed retourne un générateur
-        embeddings = list(sparse_model.embed([text]))
+        if sparse_model is None:
+            return None
 
-        if not embeddings:
+        try:
+            # FastEmbed retourne un générateur
+            embeddings = list(sparse_model.embed([text]))
+
+            if not embeddings:
+                return None
+
+            sparse_embedding = embeddings[0]
+            # Une seule conversion numpy -> Python ; SparseVector valide et recopie
+            # les listes, le cache n'est donc jamais exposé à l'appelant
+            cached = (
+                sparse_embedding.indices.tolist(),
+                sparse_embedding.values.tolist()
+            )
+        except Exception as e:
+            _rag_logger.warning(f"Erreur génération sparse vector: {e}")
             return None
 
-        sparse_embedding = embeddings[0]
+        performance = get_rag_config().performance
+        if performance.use_cache:
+            with _sparse_cache_lock:
+                _sparse_cache[text] = cached
+                while len(_sparse_cache) > performance.cache_size:
+                    _sparse_cache.popitem(last=False)
 
-        from qdrant_client.models import SparseVector
-        return SparseVector(
-            indices=sparse_embedding.indices.tolist(),
-            values=sparse_embedding.values.tolist()
-        )
-    except Exception as e:
-        _rag_logger.warning(f"Erreur génération sparse vector: {e}")
+    from qdrant_client.models import SparseVector
+    return SparseVector(indices=cached[0], values=cached[1])
+
+
+def clear_sparse_cache():
+    """Vide le cache des sparse vectors de requêtes."""
+    with _sparse_cache_lock:
+        _sparse_cache.clear()
+
+
+def _mark_word(match: "re.Match") -> str:
+    """Surligne un mot de la requête (les entités HTML sont laissées intactes)."""
+    word = match.group(1)
+    if word is None:
+        return match.group(0)
+    return f"<mark>{word}</mark>"
+
+
+def _escape_html(text: str) -> str:
+    """Échappe le HTML (markupsafe si disponible, sinon html.escape)."""
+    if MARKUPSAFE_AVAILABLE:
+        return str(_markup_escape(text))
+    return html.escape(text)
+
+
+@lru_cache(maxsize=64)
+def _query_word_patterns(
+    query: str, min_word_length: int
+) -> Optional[Tuple["re.Pattern", "re.Pattern"]]:
+    """
+    Compile les motifs de surlignage d'une requête.
+
+    Mémorisé : une même requête est surlignée sur chacun des documents
+    affichés, les motifs ne sont compilés qu'une fois.
+
+    Returns:
+        (préfiltre, motif de surlignage), ou None si aucun mot n'est retenu
+    """
+    query_words = {
+        w.lower()
+        for w in _WORD_RE.findall(query)
+        if len(w) >= min_word_length
+    }
+    if not query_words:
         return None
 
+    # RE2 compile l'alternation en automate : coût linéaire quel que
+    # soit le nombre de mots (même API compile/search/sub que re)
+    engine = re2 if RE2_AVAILABLE else re
+
+    # Une seule alternation (mots les plus longs d'abord) : un passage par phrase.
+    words = "|".join(engine.escape(w) for w in sorted(query_words, key=len, reverse=True))
+
+    # Les entités sont consommées en premier pour ne jamais surligner
+    # l'intérieur d'un "&quot;" ou d'un "&amp;"
+    return (
+        engine.compile(f"(?i){words}"),
+        engine.compile(f"(?i){_HTML_ENTITY_PATTERN}|({words})"),
+    )
+
 
 def highlight_relevant_sentences(text: str, query: str) -> str:
     """Highlight relevant sentences in text based on query."""
     config = get_rag_config()
 
     if not text or not query:
-        return html.escape(text or "")
+        return _escape_html(text or "")
 
     if not config.highlighting.highlight_sentences:
-        return html.escape(text)
+        return _escape_html(text)
 
-    query_words = {
-        w.lower()
-        for w in re.findall(r"\w+", query)
-        if len(w) >= config.highlighting.min_word_length
-    }
+    patterns = _query_word_patterns(query, config.highlighting.min_word_length)
+
+    # Échappement HTML en un seul appel : l'échappement ne touche ni aux
+    # espaces ni à .!? donc les frontières de phrases sont inchangées
+    sentences = _SENTENCE_SPLIT_RE.split(_escape_html(text))
+
+    if patterns is None:
+        return " ".join(sentences)
 
-    sentences = re.split(r"(?<=[.!?])\s+", text)
+    prefilter, words_pattern = patterns
+
+    # Préfiltre : un seul balayage du texte entier (en C) avant le travail par phrase
+    if prefilter.search(text) is None:
+        return " ".join(sentences)
+
+    color = config.highlighting.highlight_color
     highlighted = []
 
     for s in sentences:
-        s_lower = s.lower()
-        if any(w in s_lower for w in query_words):
-            escaped = html.escape(s)
-            for w in sorted(query_words, key=len, reverse=True):
-                escaped = re.sub(
-                    re.escape(w),
-                    r"<mark>\g<0></mark>",
-                    escaped,
-                    flags=re.IGNORECASE
-                )
-            color = config.highlighting.highlight_color
-            highlighted.append(f"<mark style='background:{color}'>{escaped}</mark>")
+        marked = words_pattern.sub(_mark_word, s)
+        # Seul un mot surligné change la longueur de la phrase
+        if len(marked) == len(s):
+            highlighted.append(s)
         else:
-            highlighted.append(html.escape(s))
+            highlighted.append(f"<mark style='background:{color}'>{marked}</mark>")
 
     return " ".join(highlighted)
 
 
+def collection_supports_hybrid(collection: str) -> bool:
+    """
+    Indique si une collection possède un vecteur sparse nommé "sparse".
+
+    Le résultat est mémorisé pour éviter, sur une collection dense seule,
+    un appel hybride voué à l'échec avant chaque repli dense.
+    """
+    supported = _hybrid_support.get(collection)
+    if supported is not None:
+        return supported
+
+    try:
+        params = get_qdrant_client().get_collection(collection).config.params
+    except Exception as e:
+        # Capacité inconnue : tenter l'hybride sans mémoriser
+        _rag_logger.warning(f"Configuration de '{collection}' indisponible: {e}")
+        return True
+
+    supported = "sparse" in (params.sparse_vectors or {})
+    _hybrid_support[collection] = supported
+    return supported
+
+
+def _quantization_search_params(oversampling: float):
+    """
+    Paramètres de recherche pour les collections quantifiées.
+
+    Recherche sur les vecteurs int8 avec oversampling x top_k candidats,
+    puis rescoring sur les vecteurs originaux. None = paramètres par défaut.
+    """
+    if oversampling <= 0:
+        return None
+
+    from qdrant_client.models import SearchParams, QuantizationSearchParams
+    return SearchParams(
+        quantization=QuantizationSearchParams(rescore=True, oversampling=oversampling)
+    )
+
+
 def retrieve_relevant_docs(
     collection: str,
     query: str,
@@ -163,18 +356,24 @@ def retrieve_relevant_docs(
 
     # Récupérer le service d'embeddings
     embedding_service = get_embedding_service(openai_client)
+    search_params = _quantization_search_params(config.retrieval.quantization_oversampling)
+
+    if method == "hybrid" and SPARSE_AVAILABLE and not collection_supports_hybrid(collection):
+        _rag_logger.info(f"Pas de vecteur sparse dans '{collection}', recherche dense")
+        method = "dense"
 
     # ✅ RECHERCHE HYBRIDE COMPLÈTE
     if method == "hybrid" and SPARSE_AVAILABLE:
         try:
-            # 1. Générer dense vector
+            # 1-2. Sparse vector (BM25 local) en tâche de fond pendant l'appel
+            # d'embedding dense à l'API
+            sparse_future = _embedding_pool.submit(generate_sparse_vector, query)
+
             dense_vector = embedding_service.encode_query(
                 query,
                 config.models.embedding_model
             )
-
-            # 2. Générer sparse vector
-            sparse_vector = generate_sparse_vector(query)
+            sparse_vector = sparse_future.result()
 
             if sparse_vector is None:
                 _rag_logger.warning("Sparse vector échoué, fallback vers dense")
@@ -183,19 +382,24 @@ def retrieve_relevant_docs(
                 # 3. Recherche hybride avec Prefetch + Fusion RRF
                 from qdrant_client.models import Prefetch, FusionQuery
 
+                # Chaque branche remonte plus de candidats que la fusion n'en
+                # garde : sinon la RRF ne voit que le haut de chaque liste
+                prefetch_limit = top_k * max(1, config.retrieval.prefetch_factor)
+
                 try:
-                    results = qdrant_client.query_points(
+                    results = get_qdrant_client().query_points(
                         collection_name=collection,
                         prefetch=[
                             Prefetch(
                                 query=dense_vector,
                                 using="dense",
-                                limit=top_k
+                                limit=prefetch_limit,
+                                params=search_params
                             ),
                             Prefetch(
                                 query=sparse_vector,
                                 using="sparse",
-                                limit=top_k
+                                limit=prefetch_limit
                             )
                         ],
                         query=FusionQuery(fusion="rrf"),
@@ -224,40 +428,35 @@ def retrieve_relevant_docs(
         )
 
         try:
-            results = qdrant_client.query_points(
+            results = get_qdrant_client().query_points(
                 collection_name=collection,
                 query=dense_vector,
                 using="dense",
                 limit=top_k,
                 with_payload=True,
-                score_threshold=min_score if min_score > 0 else None
+                score_threshold=min_score if min_score > 0 else None,
+                search_params=search_params
             ).points
 
         except Exception as e:
             _rag_logger.error(f"Erreur recherche Qdrant: {e}")
             return []
 
-    # Traiter les résultats
+    # Traiter les résultats (query_points renvoie toujours un score)
+    model = config.models.embedding_model
     docs = []
     for r in results:
-        score = getattr(r, "score", None)
-        distance = getattr(r, "distance", None)
-
-        if score is None and distance is not None:
-            score = 1 - distance
-
-        if score is not None and score < min_score:
+        if r.score < min_score:
             continue
-
         p = r.payload or {}
         docs.append({
             "id": r.id,
-            "score": float(score) if score is not None else 0.0,
+            "score": float(r.score),
             "text": p.get("text", ""),
             "filename": p.get("filename"),
             "filepath": p.get("filepath"),
             "chunk_id": p.get("chunk_id"),
-            "model": config.models.embedding_model,
+            "model": model,
             "search_method": method
         })
 
@@ -265,12 +464,59 @@ def retrieve_relevant_docs(
     return docs
 
 
+def _point_to_chunk(point) -> Dict:
+    """Convertit un point Qdrant en dict de chunk."""
+    p = point.payload or {}
+    return {
+        "id": point.id,
+        "score": 0.0,
+        "text": p.get("text", ""),
+        "filename": p.get("filename"),
+        "filepath": p.get("filepath"),
+        "chunk_id": p.get("chunk_id"),
+        "model": p.get("model_label") or p.get("embedding_model")
+    }
+
+
+def _chunk_cache_lookup(key: Tuple[str, str, int]) -> Tuple[bool, Optional[Dict]]:
+    """Cherche un chunk dans le cache (retourne (trouvé, chunk))."""
+    with _chunk_cache_lock:
+        if key not in _chunk_cache:
+            return False, None
+        _chunk_cache.move_to_end(key)
+        chunk = _chunk_cache[key]
+    return True, dict(chunk) if chunk is not None else None
+
+
+def _chunk_cache_store(key: Tuple[str, str, int], chunk: Optional[Dict]):
+    """Ajoute un chunk (ou son absence) au cache, dans la limite configurée."""
+    performance = get_rag_config().performance
+    if not performance.use_cache:
+        return
+    with _chunk_cache_lock:
+        _chunk_cache[key] = chunk
+        _chunk_cache.move_to_end(key)
+        while len(_chunk_cache) > performance.cache_size:
+            _chunk_cache.popitem(last=False)
+
+
+def clear_chunk_cache():
+    """Vide le cache des chunks (à appeler après réindexation d'une collection)."""
+    with _chunk_cache_lock:
+        _chunk_cache.clear()
+    _hybrid_support.clear()
+
+
 def get_chunk_by_id(
     collection: str,
     filepath: str,
     chunk_id: int
 ) -> Optional[Dict]:
     """Récupère un chunk spécifique."""
+    found, chunk = _chunk_cache_lookup((collection, filepath, chunk_id))
+    if found:
+        return chunk
+
     try:
         from qdrant_client.models import Filter, FieldCondition, MatchValue
 
@@ -281,62 +527,165 @@ def get_chunk_by_id(
             ]
         )
 
-        points, _ = qdrant_client.scroll(
+        points, _ = get_qdrant_client().scroll(
             collection_name=collection,
             scroll_filter=scroll_filter,
             limit=1,
             with_payload=True
         )
 
-        if points:
-            p = points[0].payload or {}
-            return {
-                "id": points[0].id,
-                "score": 0.0,
-                "text": p.get("text", ""),
-                "filename": p.get("filename"),
-                "filepath": p.get("filepath"),
-                "chunk_id": p.get("chunk_id"),
-                "model": p.get("model_label") or p.get("embedding_model")
-            }
+        chunk = _point_to_chunk(points[0]) if points else None
+        _chunk_cache_store((collection, filepath, chunk_id), chunk)
+        return dict(chunk) if chunk is not None else None
     except Exception as e:
         _rag_logger.warning(f"Erreur récupération chunk {chunk_id}: {e}")
 
     return None
 
 
-def get_adjacent_chunks(
+def get_chunks_batch(
     collection: str,
-    doc: Dict,
-    chunks_before: int = 1,
-    chunks_after: int = 1
-) -> Dict[str, List[Dict]]:
-    """Récupère les chunks adjacents."""
-    result = {'before': [], 'current': doc, 'after': []}
+    wanted: Dict[str, Set[int]]
+) -> Dict[Tuple[str, int], Dict]:
+    """
+    Récupère en une seule requête scroll un ensemble de chunks.
 
+    Args:
+        collection: Nom de la collection Qdrant
+        wanted: {filepath: {chunk_id, ...}} des chunks à récupérer
+
+    Returns:
+        Dict {(filepath, chunk_id): chunk}
+    """
+    chunks: Dict[Tuple[str, int], Dict] = {}
+
+    # Servir depuis le cache ce qui peut l'être
+    missing: Dict[str, Set[int]] = {}
+    for filepath, ids in wanted.items():
+        for cid in ids:
+            found, chunk = _chunk_cache_lookup((collection, filepath, cid))
+            if not found:
+                missing.setdefault(filepath, set()).add(cid)
+            elif chunk is not None:
+                chunks[(filepath, cid)] = chunk
+
+    wanted = missing
+    if not wanted:
+        return chunks
+
+    try:
+        from qdrant_client.models import Filter, FieldCondition, MatchAny, MatchValue
+
+        scroll_filter = Filter(
+            should=[
+                Filter(must=[
+                    FieldCondition(key="filepath", match=MatchValue(value=filepath)),
+                    FieldCondition(key="chunk_id", match=MatchAny(any=sorted(ids)))
+                ])
+                for filepath, ids in wanted.items()
+            ]
+        )
+
+        limit = sum(len(ids) for ids in wanted.values())
+        offset = None
+
+        while True:
+            points, offset = get_qdrant_client().scroll(
+                collection_name=collection,
+                scroll_filter=scroll_filter,
+                limit=limit,
+                offset=offset,
+                with_payload=True
+            )
+
+            for point in points:
+                chunk = _point_to_chunk(point)
+                try:
+                    key = (chunk["filepath"], int(chunk["chunk_id"]))
+                except (ValueError, TypeError):
+                    continue
+                chunks.setdefault(key, chunk)
+
+            if offset is None or not points:
+                break
+
+        # Mémoriser les chunks trouvés comme les absents (ex. après le dernier chunk)
+        for filepath, ids in wanted.items():
+            for cid in ids:
+                _chunk_cache_store((collection, filepath, cid), chunks.get((filepath, cid)))
+
+    except Exception as e:
+        _rag_logger.warning(f"Erreur récupération des chunks adjacents: {e}")
+
+    return chunks
+
+
+def _adjacent_chunk_ids(
+    doc: Dict,
+    chunks_before: int,
+    chunks_after: int
+) -> Optional[Tuple[str, int, List[int], List[int]]]:
+    """Calcule les IDs des chunks avant/après un document (None si impossible)."""
     chunk_id = doc.get('chunk_id')
     filepath = doc.get('filepath')
 
     if chunk_id is None or filepath is None:
-        return result
+        return None
 
     try:
         chunk_num = int(chunk_id)
     except (ValueError, TypeError):
+        return None
+
+    before_ids = [
+        chunk_num - i for i in range(chunks_before, 0, -1)
+        if chunk_num - i >= 0
+    ]
+    after_ids = [chunk_num + i for i in range(1, chunks_after + 1)]
+
+    return filepath, chunk_num, before_ids, after_ids
+
+
+def get_adjacent_chunks(
+    collection: str,
+    doc: Dict,
+    chunks_before: int = 1,
+    chunks_after: int = 1,
+    chunk_index: Optional[Dict[Tuple[str, int], Dict]] = None
+) -> Dict[str, List[Dict]]:
+    """
+    Récupère les chunks adjacents.
+
+    Args:
+        collection: Nom de la collection Qdrant
+        doc: Document central
+        chunks_before: Nombre de chunks avant
+        chunks_after: Nombre de chunks après
+        chunk_index: Chunks déjà récupérés par get_chunks_batch (optionnel)
+    """
+    result = {'before': [], 'current': doc, 'after': []}
+
+    ids = _adjacent_chunk_ids(doc, chunks_before, chunks_after)
+    if ids is None:
         return result
 
-    for i in range(chunks_before, 0, -1):
-        prev_chunk_id = chunk_num - i
-        if prev_chunk_id >= 0:
-            prev_doc = get_chunk_by_id(collection, filepath, prev_chunk_id)
-            if prev_doc:
-                result['before'].append(prev_doc)
+    filepath, _, before_ids, after_ids = ids
 
-    for i in range(1, chunks_after + 1):
-        next_chunk_id = chunk_num + i
-        next_doc = get_chunk_by_id(collection, filepath, next_chunk_id)
-        if next_doc:
-            result['after'].append(next_doc)
+    if chunk_index is None:
+        chunk_index = get_chunks_batch(
+            collection,
+            {filepath: set(before_ids) | set(after_ids)}
+        )
+
+    # Copies : un même chunk peut être adjacent à plusieurs documents
+    result['before'] = [
+        dict(chunk_index[(filepath, cid)]) for cid in before_ids
+        if (filepath, cid) in chunk_index
+    ]
+    result['after'] = [
+        dict(chunk_index[(filepath, cid)]) for cid in after_ids
+        if (filepath, cid) in chunk_index
+    ]
 
     return result
 
@@ -352,6 +701,17 @@ def expand_documents_with_context(
     if chunks_before == 0 and chunks_after == 0:
         return docs
 
+    # Récupérer tous les chunks adjacents en une seule requête
+    wanted: Dict[str, Set[int]] = defaultdict(set)
+    for doc in docs:
+        ids = _adjacent_chunk_ids(doc, chunks_before, chunks_after)
+        if ids is not None:
+            filepath, _, before_ids, after_ids = ids
+            wanted[filepath].update(before_ids)
+            wanted[filepath].update(after_ids)
+
+    chunk_index = get_chunks_batch(collection, wanted)
+
     expanded_docs = []
     processed_chunks: Set[tuple] = set()
 
@@ -364,7 +724,9 @@ def expand_documents_with_context(
             continue
         processed_chunks.add(chunk_key)
 
-        adjacent = get_adjacent_chunks(collection, doc, chunks_before, chunks_after)
+        adjacent = get_adjacent_chunks(
+            collection, doc, chunks_before, chunks_after, chunk_index=chunk_index
+        )
 
         if merge_adjacent:
             all_chunks = adjacent['before'] + [adjacent['current']] + adjacent['after']
@@ -390,6 +752,11 @@ def expand_documents_with_context(
     return expanded_docs
 
 
+def _rerank_score(doc: Dict) -> float:
+    """Clé de tri des documents rerankés."""
+    return doc.get("rerank_score", 0.0)
+
+
 def rerank_docs_api(
     query: str,
     docs: List[Dict],
@@ -406,6 +773,10 @@ def rerank_docs_api(
         openai_client: Client OpenAI
         top_n: Nombre de documents à retourner
         min_rerank_score: Score minimum
+
+    Seuls les reranking.max_docs premiers candidats (ordre de la recherche)
+    sont envoyés au reranker ; les suivants n'ont pas de score de reranking
+    et passent donc après les documents rerankés.
     """
     config = get_rag_config()
 
@@ -427,7 +798,12 @@ def rerank_docs_api(
 
     # Préparer les documents
     max_chars = config.context.max_chars_per_doc
-    documents = [d["text"][:max_chars] for d in docs]
+    max_docs = config.reranking.max_docs
+    candidates = docs[:max_docs] if max_docs > 0 else docs
+    documents = truncate_to_tokens(
+        [d["text"][:max_chars] for d in candidates],
+        config.reranking.max_tokens
+    )
 
     # Vérifier qu'on a des textes valides
     valid_texts = [t for t in documents if t and len(t) > 0]
@@ -435,37 +811,103 @@ def rerank_docs_api(
         _rag_logger.warning("Aucun texte valide trouvé pour le reranking")
         return docs[:top_n]
 
+    # Dédupliquer les textes identiques (chunks voisins partagés après expansion)
+    positions: Dict[str, List[int]] = defaultdict(list)
+    for i, text in enumerate(documents):
+        positions[text].append(i)
+    unique_texts = list(positions)
+
     # Reranker via API
     try:
         results = reranker.rerank(
             query=query,
-            documents=documents,
+            documents=unique_texts,
             model=config.models.reranking_model,
             top_n=top_n if top_n > 0 else None
         )
 
-        # Associer les scores aux documents
+        # Associer les scores à tous les documents portant le même texte
         for result in results:
-            doc_idx = result.get("index", 0)
-            score = result.get("relevance_score", 0.0)
-            if doc_idx < len(docs):
-                docs[doc_idx]["rerank_score"] = float(score)
+            uniq_idx = result.get("index", 0)
+            score = float(result.get("relevance_score", 0.0))
+            if uniq_idx < len(unique_texts):
+                for doc_idx in positions[unique_texts[uniq_idx]]:
+                    docs[doc_idx]["rerank_score"] = score
 
-        # Filtrer et trier
+        # Filtrer puis sélectionner les top_n sans trier toute la liste
         docs = [d for d in docs if d.get("rerank_score", 0.0) >= min_rerank_score]
-        docs.sort(key=lambda x: x.get("rerank_score", 0.0), reverse=True)
+        if top_n > 0:
+            docs = heapq.nlargest(top_n, docs, key=_rerank_score)
+        else:
+            docs.sort(key=_rerank_score, reverse=True)
+            docs = docs[:top_n]
 
-        _rag_logger.info(f"✅ Reranking appliqué ({len(docs[:top_n])} documents)")
-        return docs[:top_n]
+        _rag_logger.info(f"✅ Reranking appliqué ({len(docs)} documents)")
+        return docs
 
     except Exception as e:
         _rag_logger.warning(f"Reranking échoué : {e}")
         return docs[:top_n]
 
 
+def _get_token_encoder():
+    """Récupère l'encodeur tiktoken (singleton, None si indisponible)."""
+    global _token_encoder, _token_encoder_loaded
+
+    if not _token_encoder_loaded:
+        # Verrou : l'encodeur peut être demandé depuis le pool de threads
+        with _token_encoder_lock:
+            if not _token_encoder_loaded:
+                if TIKTOKEN_AVAILABLE:
+                    try:
+                        _token_encoder = tiktoken.get_encoding("cl100k_base")
+                    except Exception as e:
+                        # Le fichier BPE est téléchargé au premier usage
+                        _rag_logger.warning(f"tiktoken indisponible, estimation approximative: {e}")
+                _token_encoder_loaded = True
+
+    return _token_encoder
+
+
 def estimate_token_count(text: str) -> int:
     """Estime le nombre de tokens."""
-    return len(text) // 4
+    encoder = _get_token_encoder()
+    if encoder is None:
+        return len(text) // 4
+    return len(encoder.encode_ordinary(text))
+
+
+def estimate_token_counts(texts: List[str]) -> List[int]:
+    """Estime le nombre de tokens de plusieurs textes en un seul appel (multi-thread)."""
+    encoder = _get_token_encoder()
+    if encoder is None:
+        return [len(text) // 4 for text in texts]
+    return [len(tokens) for tokens in encoder.encode_ordinary_batch(texts)]
+
+
+def truncate_to_tokens(texts: List[str], max_tokens: int) -> List[str]:
+    """
+    Tronque des textes à max_tokens tokens (encodage et décodage par lots).
+
+    Sans effet si max_tokens <= 0 ou si tiktoken est indisponible ; seuls
+    les textes trop longs sont décodés.
+    """
+    encoder = _get_token_encoder()
+    if max_tokens <= 0 or encoder is None or not texts:
+        return texts
+
+    encoded = encoder.encode_ordinary_batch(texts)
+    too_long = [i for i, tokens in enumerate(encoded) if len(tokens) > max_tokens]
+    if not too_long:
+        return texts
+
+    truncated = list(texts)
+    decoded = encoder.decode_batch([encoded[i][:max_tokens] for i in too_long])
+    for i, text in zip(too_long, decoded):
+        # Une coupure au milieu d'un caractère multi-octets donne "\ufffd"
+        truncated[i] = text.rstrip("\ufffd")
+
+    return truncated
 
 
 def build_rag_system_message(
@@ -523,6 +965,12 @@ def build_rag_system_message(
             merge_adjacent=expand_config.merge_adjacent
         )
 
+    # Comptage des tokens des textes en tâche de fond pendant le reranking
+    candidates = docs
+    text_tokens_future = _embedding_pool.submit(
+        estimate_token_counts, [d.get('text', '') for d in candidates]
+    )
+
     # Rerank avec API
     docs = rerank_docs_api(query, docs, openai_client)
 
@@ -531,8 +979,8 @@ def build_rag_system_message(
         return None
 
     # Build context blocks
-    context_blocks = []
-    total_tokens = 0
+    blocks = []
+    source_lines = []
 
     for d in docs:
         score = d.get("rerank_score") or d.get("score", 0.0)
@@ -549,9 +997,24 @@ def build_rag_system_message(
         )
 
         text = d.get('text', '')
-        block = f"{source_line}\n{text}"
+        source_lines.append(f"{source_line}\n")
+        blocks.append(f"{source_line}\n{text}")
+
+    # Tokens d'un bloc ≈ ligne source (score connu après reranking) + texte
+    # (déjà compté) ; les documents rerankés sont les mêmes objets que les candidats
+    text_tokens = dict(zip(map(id, candidates), text_tokens_future.result()))
+    block_token_counts = [
+        source_tokens + text_tokens[id(d)]
+        if id(d) in text_tokens
+        else source_tokens + estimate_token_count(d.get('text', ''))
+        for d, source_tokens in zip(docs, estimate_token_counts(source_lines))
+    ]
+
+    # Sélection dans le budget
+    context_blocks = []
+    total_tokens = 0
 
-        block_tokens = estimate_token_count(block)
+    for block, block_tokens in zip(blocks, block_token_counts):
         if total_tokens + block_tokens > max_tokens:
             break
 
@@ -569,3 +1032,8 @@ def build_rag_system_message(
 
     _rag_logger.info(f"✅ RAG {method.upper()}: {len(docs)} documents, ~{total_tokens} tokens")
     return system_message, docs
+
+
+# Préchargement du modèle BM25 dès l'import (premier appel hybride sans attente)
+if get_rag_config().performance.preload_sparse_model:
+    warm_up_sparse_model()
@@ -3,53 +3,110 @@ RAG system using remote collections from Albert API
 avec reranking Albert intégré.
 """
 
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Sequence, Union
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import httpx
 from openai import OpenAI
-import os
 
 from config.rag_config import get_rag_config
+from config.settings import API_KEY, settings
 from services.api_reranker import get_reranker_service
+from services.llm import get_http_client
+from services.rag import get_rag_logger
+
+# Décodage JSON rapide des réponses (json standard en repli)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Échec rapide si l'API est injoignable, recherche distante plus lente tolérée
+_REMOTE_TIMEOUT = httpx.Timeout(30.0, connect=3.05)
+
+# Cache nom de collection -> ID (évite de paginer /collections à chaque requête)
+_collection_ids: Dict[str, int] = {}
+_collection_ids_lock = threading.Lock()
 
 
 # -------------------------------------------------------------------------
 # Utils
 # -------------------------------------------------------------------------
 
-def get_collection_id(client: OpenAI, collection_name: str) -> Optional[int]:
-    """Récupère l'ID d'une collection à partir de son nom."""
-    api_key = os.getenv("API-KEY")
-    headers = {"Authorization": f"Bearer {api_key}"}
+def _parse_json(response: httpx.Response):
+    """Décode le corps JSON d'une réponse (orjson si disponible)."""
+    return orjson.loads(response.content) if ORJSON_AVAILABLE else response.json()
+
+
+def invalidate_collection_cache(collection_name: Optional[str] = None):
+    """
+    Vide le cache des IDs de collections distantes.
+
+    Args:
+        collection_name: Collection à oublier (toutes si None)
+    """
+    with _collection_ids_lock:
+        if collection_name is None:
+            _collection_ids.clear()
+        else:
+            _collection_ids.pop(collection_name, None)
+
+
+def get_collection_id(collection_name: str) -> Optional[int]:
+    """
+    Récupère l'ID d'une collection à partir de son nom.
+
+    Les IDs trouvés sont mémorisés ; une collection introuvable ne l'est
+    pas, pour qu'une collection créée entre-temps soit retrouvée.
+    """
+    cid = _collection_ids.get(collection_name)
+    if cid is not None:
+        return cid
+
+    headers = {"Authorization": f"Bearer {API_KEY}"}
+    http = get_http_client()
 
     offset = 0
     limit = 100
 
     while True:
-        response = client._client.request(
-            method="GET",
-            url="/collections",
+        response = http.get(
+            "/collections",
             params={"offset": offset, "limit": limit},
             headers=headers,
+            timeout=_REMOTE_TIMEOUT,
         )
 
         if response.status_code != 200:
-            print(f"❌ Erreur récupération collections: {response.status_code}")
+            get_rag_logger().error(f"Erreur récupération collections: {response.status_code}")
             return None
 
-        data = response.json()
+        data = _parse_json(response)
         collections = data.get("data", [])
 
         if not collections:
             break
 
-        for col in collections:
-            if col.get("name") == collection_name:
-                cid = col.get("id")
-                print(f"   ✅ Collection '{collection_name}' trouvée avec ID: {cid}")
-                return cid
+        found = None
+        with _collection_ids_lock:
+            # Mémoriser toute la page : les collections voisines sont résolues d'office
+            for col in collections:
+                name, col_id = col.get("name"), col.get("id")
+                if name is not None and col_id is not None:
+                    _collection_ids.setdefault(name, col_id)
+                if found is None and name == collection_name:
+                    found = col_id
+
+        if found is not None:
+            if get_rag_config().debug.show_rag_context:
+                print(f"   ✅ Collection '{collection_name}' trouvée avec ID: {found}")
+            return found
 
         offset += limit
 
-    print(f"   ❌ Collection '{collection_name}' non trouvée")
+    get_rag_logger().warning(f"Collection '{collection_name}' non trouvée")
     return None
 
 
@@ -67,20 +124,22 @@ def query_remote_collection(
 ) -> List[Dict]:
     """Interroge une collection distante via Albert /search."""
     config = get_rag_config()
+    # Traces détaillées uniquement en mode debug (aucun formatage sinon)
+    debug = config.debug.show_rag_context
 
     if not top_k:
         top_k = config.retrieval.top_k
 
-    print(f"   🔧 Top K utilisé: {top_k}")
-    print(f"   🔍 Méthode de recherche: {method}")
+    if debug:
+        print(f"   🔧 Top K utilisé: {top_k}")
+        print(f"   🔍 Méthode de recherche: {method}")
 
-    collection_id = get_collection_id(client, collection_name)
+    collection_id = get_collection_id(collection_name)
     if collection_id is None:
         return []
 
-    api_key = os.getenv("API-KEY")
     headers = {
-        "Authorization": f"Bearer {api_key}",
+        "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json",
     }
 
@@ -93,26 +152,28 @@ def query_remote_collection(
         "offset": 0,
     }
 
-    print("   📡 Appel API: POST /search")
-    print(f"   📦 Payload: {payload}")
+    if debug:
+        print("   📡 Appel API: POST /search")
+        print(f"   📦 Payload: {payload}")
 
-    response = client._client.request(
-        method="POST",
-        url="/search",
+    response = get_http_client().post(
+        "/search",
         json=payload,
         headers=headers,
+        timeout=_REMOTE_TIMEOUT,
     )
 
-    print(f"   ✅ Réponse API reçue (status: {response.status_code})")
-
     if response.status_code != 200:
-        print(response.text)
+        get_rag_logger().warning(
+            f"Recherche distante échouée ({response.status_code}): {response.text}"
+        )
         return []
 
-    results = response.json()
+    results = _parse_json(response)
     data_items = results.get("data", [])
 
-    print(f"   📊 {len(data_items)} résultats reçus")
+    if debug:
+        print(f"   📊 {len(data_items)} résultats reçus")
 
     documents = []
 
@@ -131,69 +192,126 @@ def query_remote_collection(
         }
 
         documents.append(document)
-        print(f"   📄 Doc {idx+1}: score={document['score']:.3f}, len={len(text)} chars")
+        if debug:
+            print(f"   📄 Doc {idx+1}: score={document['score']:.3f}, len={len(text)} chars")
 
     return documents
 
 
+def query_remote_collections(
+    client: OpenAI,
+    collection_names: Sequence[str],
+    query: str,
+    top_k: Optional[int] = None,
+    method: str = "hybrid",
+    score_threshold: float = 0.0,
+) -> List[Dict]:
+    """
+    Interroge plusieurs collections distantes en parallèle.
+
+    Returns:
+        Documents de toutes les collections, triés par score décroissant
+    """
+    names = list(dict.fromkeys(collection_names))
+    if len(names) <= 1:
+        return [
+            doc
+            for name in names
+            for doc in query_remote_collection(
+                client, name, query, top_k, method, score_threshold
+            )
+        ]
+
+    def search(name: str) -> List[Dict]:
+        docs = query_remote_collection(client, name, query, top_k, method, score_threshold)
+        for doc in docs:
+            doc["collection"] = name
+        return docs
+
+    workers = min(len(names), max(1, settings.albert_max_concurrency))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(search, names))
+
+    documents = [doc for docs in results for doc in docs]
+    documents.sort(key=lambda d: d.get("score", 0.0), reverse=True)
+    return documents
+
+
 # -------------------------------------------------------------------------
 # RAG Context + Reranking
 # -------------------------------------------------------------------------
 
 def build_rag_context_from_remote(
     client: OpenAI,
-    collection_name: str,
+    collection_name: Union[str, Sequence[str]],
     query: str,
     top_k: Optional[int] = None,
     max_tokens: Optional[int] = None,
     method: str = "hybrid",
 ) -> Optional[Tuple[Dict, List[Dict]]]:
-    """Construit le contexte RAG avec reranking Albert."""
+    """
+    Construit le contexte RAG avec reranking Albert.
+
+    Plusieurs collections peuvent être passées : elles sont interrogées en
+    parallèle et leurs résultats reclassés ensemble.
+    """
     config = get_rag_config()
+    debug = config.debug.show_rag_context
+    rag_logger = get_rag_logger()
+    collection_names = [collection_name] if isinstance(collection_name, str) else list(collection_name)
 
     if max_tokens is None:
         max_tokens = config.context.max_tokens
 
-    print(f"\n🔍 [RAG Remote] Recherche dans collection: {collection_name}")
-    print(f"   Query: {query}")
-    print(f"   Top K: {top_k}")
-    print(f"   Method: {method}")
+    rag_logger.info(f"🔍 RAG Distant - Collection: {', '.join(collection_names)}, Method: {method.upper()}")
+    if debug:
+        print(f"   Query: {query}")
+        print(f"   Top K: {top_k}")
 
-    docs = query_remote_collection(
+    docs = query_remote_collections(
         client=client,
-        collection_name=collection_name,
+        collection_names=collection_names,
         query=query,
         top_k=top_k,
         method=method,
     )
 
     if not docs:
-        print("   ⚠️ Aucun document trouvé")
+        rag_logger.warning(f"Aucun document trouvé dans '{', '.join(collection_names)}'")
         return None
 
     # ------------------------------------------------------------------
     # 🔁 RERANKING
     # ------------------------------------------------------------------
     try:
-        print("\n🔁 Application du reranker Albert...")
+        rag_logger.info("🔄 Application du reranker Albert...")
 
         reranker = get_reranker_service(client)
 
-        texts = [d["text"] for d in docs]
+        # Dédupliquer les textes identiques (même chunk dans plusieurs collections)
+        positions: Dict[str, List[int]] = defaultdict(list)
+        for i, d in enumerate(docs):
+            positions[d["text"]].append(i)
+        unique_texts = list(positions)
 
         reranked = reranker.rerank(
             query=query,
-            documents=texts,
+            documents=unique_texts,
             model=config.models.reranking_model,
             top_n=config.reranking.top_n,
         )
 
-        docs = [docs[r["index"]] for r in reranked]
+        docs = [
+            docs[i]
+            for r in reranked
+            for i in positions[unique_texts[r["index"]]]
+        ]
 
-        print(f"   ✅ Reranking appliqué ({len(docs)} documents)")
+        if debug:
+            print(f"   ✅ Reranking appliqué ({len(docs)} documents)")
 
     except Exception as e:
-        print(f"⚠️ Reranking échoué, fallback search-only: {e}")
+        rag_logger.warning(f"Reranking échoué, fallback search-only: {e}")
 
     # ------------------------------------------------------------------
     # Construction du contexte
@@ -212,14 +330,15 @@ def build_rag_context_from_remote(
         block_tokens = len(block) // 4
 
         if total_tokens + block_tokens > max_tokens:
-            print(f"   ⚠️ Budget tokens atteint ({total_tokens}/{max_tokens})")
+            if debug:
+                print(f"   ⚠️ Budget tokens atteint ({total_tokens}/{max_tokens})")
             break
 
         context_blocks.append(block)
         total_tokens += block_tokens
 
     if not context_blocks:
-        print("   ⚠️ Aucun contexte construit")
+        rag_logger.warning("Budget tokens insuffisant pour contexte")
         return None
 
     context = "\n\n".join(context_blocks)
@@ -230,7 +349,8 @@ def build_rag_context_from_remote(
         "content": content,
     }
 
-    print(f"   ✅ Contexte RAG créé ({len(context_blocks)} blocs, {total_tokens} tokens)")
-    print(f"   📝 Aperçu contexte: {content[:200]}...")
+    rag_logger.info(f"✅ RAG Distant: {len(context_blocks)} blocs, ~{total_tokens} tokens")
+    if debug:
+        print(f"   📝 Aperçu contexte: {content[:200]}...")
 
     return system_message, docs
@@ -1,5 +1,7 @@
 """Adaptateurs pour configurer les services avec Streamlit."""
+from collections import deque
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 from services.rag import RAGLogger, set_rag_logger
 from services.llm import LLMLogger, set_llm_logger
@@ -10,10 +12,11 @@ def setup_streamlit_loggers():
     Configure tous les loggers des services pour utiliser Streamlit.
     À appeler au démarrage de l'application Streamlit.
     """
-    # Logger RAG
+    # Logger RAG : les messages sont regroupés puis affichés par flush_rag_log()
+    # (le logger est global : la session est résolue au moment du log)
     rag_logger = RAGLogger(
-        warning_callback=st.warning,
-        error_callback=st.error
+        warning_callback=lambda msg: _append_rag_log("warning", msg),
+        error_callback=lambda msg: _append_rag_log("error", msg)
     )
     set_rag_logger(rag_logger)
 
@@ -24,6 +27,43 @@ def setup_streamlit_loggers():
     set_llm_logger(llm_logger)
 
 
+def _append_rag_log(level: str, msg: str):
+    """
+    Ajoute un message RAG à la file de la session Streamlit courante.
+
+    Hors session (thread de pool sans contexte Streamlit), le message
+    part en console plutôt que dans la file d'une autre session.
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        prefix = "❌ ERROR" if level == "error" else "⚠️  WARNING"
+        print(f"{prefix}: {msg}")
+        return
+
+    rag_log = st.session_state.setdefault("_rag_log", deque(maxlen=200))
+    rag_log.append((level, msg))
+
+
+def flush_rag_log():
+    """
+    Affiche en une fois les messages RAG accumulés depuis le dernier appel.
+
+    Un seul bloc par niveau au lieu d'un widget Streamlit par message.
+    """
+    rag_log = st.session_state.get("_rag_log")
+    if not rag_log:
+        return
+
+    messages = {"error": [], "warning": []}
+    while rag_log:
+        level, msg = rag_log.popleft()
+        messages[level].append(msg)
+
+    if messages["error"]:
+        st.error("\n\n".join(messages["error"]))
+    if messages["warning"]:
+        st.warning("\n\n".join(messages["warning"]))
+
+
 def setup_console_loggers():
     """
     Configure tous les loggers pour utiliser la console.
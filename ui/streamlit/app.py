@@ -3,26 +3,141 @@
 # 19/01/2026
 ##############################################################
 import os
+import queue
+import threading
+import time
 import streamlit as st
 import random
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Tuple
 
 from ui.base import UIApplication
 from ui.streamlit.rendering import StreamlitRenderer
 from ui.streamlit.components import StreamlitInput
 from ui.streamlit.state import StreamlitState
-from ui.streamlit.adapters import setup_streamlit_loggers
+from ui.streamlit.adapters import setup_streamlit_loggers, flush_rag_log
 
-from core.config import AppConfig
+from core.config import get_app_config
 from core.chat import ChatManager
 from core.context import ContextManager
 from core.models import ChatRequest, ChatContext, Message
 
-from services.qdrant import qdrant_available, qdrant_collections
-from services.collections import CollectionManager
+from services.collections import CollectionManager, clear_collection_caches
 from config.rag_config import get_rag_config, reload_rag_config
 from config.export_config import get_export_config
 
+# Intervalle minimal entre deux rendus pendant le streaming (secondes)
+_STREAM_RENDER_INTERVAL = 0.05
+
+# Fragment Streamlit (>= 1.33, "experimental_" avant 1.37) ; sinon rendu complet
+_chat_fragment = (
+    getattr(st, "fragment", None)
+    or getattr(st, "experimental_fragment", None)
+    or (lambda func: func)
+)
+
+# Récupération des URL en tâche de fond (pendant l'extraction des PDFs)
+_url_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chaton-url")
+
+
+# Marqueur de fin du stream LLM consommé en tâche de fond
+_STREAM_END = object()
+
+# Morceaux en attente maximum entre le thread réseau et le rendu
+_STREAM_QUEUE_SIZE = 256
+
+
+def _prefetch_stream(stream: Iterator[str]) -> Iterator[str]:
+    """
+    Consomme le stream LLM dans un thread dédié.
+
+    La réception réseau se poursuit pendant les rendus ; chaque itération
+    renvoie d'un bloc tous les morceaux arrivés depuis la précédente.
+    Une erreur du stream est relevée dans le thread appelant. Si le
+    consommateur s'arrête (rerun, arrêt du script), le thread cesse de
+    lire et ferme le stream.
+    """
+    chunks: "queue.Queue" = queue.Queue(maxsize=_STREAM_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # File bornée : attendre le rendu, sauf si le consommateur est parti
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in stream:
+                if not put(chunk):
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            # Fermé depuis ce thread : un générateur en cours ne peut l'être ailleurs
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            put(_STREAM_END)
+
+    threading.Thread(target=produce, name="chaton-llm-stream", daemon=True).start()
+
+    try:
+        while True:
+            # Attendre au moins un morceau, puis vider ce qui est déjà arrivé
+            batch = [chunks.get()]
+            while True:
+                try:
+                    batch.append(chunks.get_nowait())
+                except queue.Empty:
+                    break
+
+            done = batch[-1] is _STREAM_END
+            if done:
+                batch.pop()
+            for item in batch:
+                if isinstance(item, Exception):
+                    raise item
+
+            if batch:
+                yield "".join(batch)
+            if done:
+                return
+    finally:
+        stop.set()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _extract_pdfs_cached(pdf_files: Tuple[Tuple[str, bytes], ...]) -> str:
+    """Texte des PDFs, mis en cache par contenu : un même lot n'est analysé qu'une fois."""
+    # Les couples (nom, bytes) sont transmis tels quels : aucune relecture
+    return ContextManager().extract_multiple_pdfs_text(list(pdf_files))
+
+
+@st.cache_data(show_spinner=False, ttl=600, max_entries=32)
+def _extract_url_cached(url: str) -> str:
+    """
+    Contenu d'une URL, mis en cache 10 minutes.
+
+    Une erreur est levée plutôt que renvoyée : st.cache_data ne la mémorise pas.
+    """
+    return ContextManager().extract_url_content(url, raise_errors=True)
+
+
+@st.cache_resource(show_spinner=False, ttl=300)
+def _get_collection_manager(_llm_client) -> CollectionManager:
+    """
+    Gestionnaire de collections partagé entre reruns et sessions.
+
+    Sa construction interroge Qdrant et l'API distante : elle n'est refaite
+    qu'après 5 minutes au lieu de chaque interaction.
+    """
+    return CollectionManager(_llm_client)
+
 
 class StreamlitChatApp(UIApplication):
     def __init__(self):
@@ -32,7 +147,7 @@ class StreamlitChatApp(UIApplication):
         setup_streamlit_loggers()
 
         # Configuration générale
-        self.config = AppConfig()
+        self.config = get_app_config()
         self.rag_config = get_rag_config()
         self.export_config = get_export_config()
 
@@ -42,10 +157,10 @@ class StreamlitChatApp(UIApplication):
         self.main_input = StreamlitInput(sidebar=False)
         self.state = StreamlitState()
 
-        # Managers
+        # Managers (ChatManager reste par session : il porte la conversation)
         self.chat_manager = ChatManager(self.config.llm_client)
         self.context_manager = ContextManager()
-        self.collection_manager = CollectionManager(self.config.llm_client)
+        self.collection_manager = _get_collection_manager(self.config.llm_client)
 
         # Variables d'état
         self.selected_model = None
@@ -83,6 +198,9 @@ class StreamlitChatApp(UIApplication):
             self.chat_manager.reset_for_new_context()
             self.state.set("conversation", [])
             self.state.set("context_key", "")
+            # Recharger la liste des collections (locales et distantes) au prochain rendu
+            clear_collection_caches()
+            _get_collection_manager.clear()
             st.rerun()
 
         self.selected_prompt = self.sidebar_input.get_selectbox(
@@ -94,14 +212,9 @@ class StreamlitChatApp(UIApplication):
             st.sidebar.error("❌ Aucun modèle LLM disponible")
             st.stop()
 
-        model_labels = [
-            model.display_name
-            for model in self.config.available_models.values()
-        ]
-
         selected_label = self.sidebar_input.get_selectbox(
             "**Modèles disponibles**",
-            model_labels
+            self.config.available_model_labels
         )
 
         self.selected_model = self.config.get_model_by_display_name(selected_label)
@@ -174,9 +287,13 @@ class StreamlitChatApp(UIApplication):
         with main_container:
             self.state.initialize()
 
-        # Créer une clé unique pour le contexte actuel
-        pdf_signature = "_".join([pdf.name for pdf in self.uploaded_pdfs]) if self.uploaded_pdfs else "no_pdf"
-        context_key = f"{self.selected_prompt}_{pdf_signature}_{bool(self.uploaded_image)}_{bool(self.url_input)}"
+        # Clé du contexte actuel : un tuple, comparé tel quel sans construire de chaîne
+        context_key = (
+            self.selected_prompt,
+            tuple(pdf.name for pdf in self.uploaded_pdfs or ()),
+            bool(self.uploaded_image),
+            bool(self.url_input),
+        )
 
         # Vérifier si le contexte a changé
         previous_context = self.state.get("context_key", "")
@@ -194,12 +311,19 @@ class StreamlitChatApp(UIApplication):
             profile_info += f" | 📄 {len(self.uploaded_pdfs)} PDF(s) chargé(s)"
         self.renderer.render_info(profile_info)
 
-        # Restaurer la conversation depuis l'état
-        stored_conversation = self.state.get("conversation", [])
-        self.chat_manager.conversation = [
-            Message(**msg) if isinstance(msg, dict) else msg
-            for msg in stored_conversation
-        ]
+        self._render_chat()
+
+    @_chat_fragment
+    def _render_chat(self):
+        """
+        Historique, saisie et réponse en streaming.
+
+        Exécuté comme fragment quand Streamlit le permet : l'envoi d'une
+        question ne relance que cette partie, pas la barre latérale.
+        """
+        # Restaurer la conversation depuis l'état : les objets Message y sont
+        # conservés tels quels (pas de reconstruction à chaque rerun)
+        self.chat_manager.conversation = self.state.get("conversation", [])
 
         # Afficher l'historique
         current_question = None
@@ -240,13 +364,19 @@ class StreamlitChatApp(UIApplication):
         # Préparer le contexte avec TOUS les PDFs
         context = ChatContext()
 
+        # L'URL (réseau) est récupérée pendant l'extraction des PDFs (CPU)
+        url_future = _url_pool.submit(_extract_url_cached, self.url_input) if self.url_input else None
+
         if self.uploaded_pdfs:
-            context.pdf_text = self.context_manager.extract_multiple_pdfs_text(
-                self.uploaded_pdfs
+            context.pdf_text = _extract_pdfs_cached(
+                tuple((pdf.name, pdf.getvalue()) for pdf in self.uploaded_pdfs)
             )
 
-        if self.url_input:
-            context.url_content = self.context_manager.extract_url_content(self.url_input)
+        if url_future is not None:
+            try:
+                context.url_content = url_future.result()
+            except Exception as e:
+                context.url_content = f"[Erreur lors de la récupération de l'URL: {e}]"
 
         context.system_prompt = self.config.get_prompt(self.selected_prompt)
 
@@ -285,13 +415,22 @@ class StreamlitChatApp(UIApplication):
                     is_remote_collection=is_remote,
                     debug=debug_mode
                 )
-
-                # Accumuler la réponse
-                full_response = ""
-                for chunk in response_stream:
-                    full_response += chunk
-                    with placeholder.container():
-                        self.renderer.render_streaming_content(full_response)
+                flush_rag_log()
+
+                # Accumuler la réponse : le rendu complet (LaTeX) est limité
+                # à un toutes les 50 ms au lieu d'un par token
+                parts = []
+                last_render = 0.0
+                for chunk in _prefetch_stream(response_stream):
+                    parts.append(chunk)
+                    now = time.monotonic()
+                    if now - last_render >= _STREAM_RENDER_INTERVAL:
+                        last_render = now
+                        with placeholder.container():
+                            self.renderer.render_streaming_content("".join(parts))
+
+                # Le rendu final ci-dessous affiche la fin de la réponse
+                full_response = "".join(parts)
 
                 # Affichage final avec LaTeX
                 if full_response:
@@ -323,12 +462,11 @@ class StreamlitChatApp(UIApplication):
                 self.renderer.render_rag_sources(rag_docs)
 
         except Exception as e:
+            flush_rag_log()
             self.renderer.render_error(str(e))
 
-        # Sauvegarder la conversation
-        self.state.set("conversation", [
-            msg.to_dict() for msg in self.chat_manager.conversation
-        ])
+        # Sauvegarder la conversation (référence à la liste, sans sérialisation)
+        self.state.set("conversation", self.chat_manager.conversation)
 
         # Message d'avertissement
         st.markdown("---")
@@ -67,7 +67,8 @@ def fetch_url_content(
     url: str,
     timeout: int = 8,
     max_chars: int = 32_000,
-    preserve_tables: bool = True
+    preserve_tables: bool = True,
+    raise_errors: bool = False
 ) -> str:
     try:
         response = requests.get(url, timeout=timeout)
@@ -121,4 +122,7 @@ def fetch_url_content(
         return cleaned[:max_chars]
 
     except Exception as e:
+        # L'appelant peut préférer l'exception (pour ne pas mettre l'erreur en cache)
+        if raise_errors:
+            raise
         return f"[Erreur lors de la récupération de l'URL] {e}"
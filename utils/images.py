@@ -4,21 +4,21 @@ from typing import Union, BinaryIO
 from io import BytesIO
 
 
-def encode_image(image_file: Union[BinaryIO, bytes, BytesIO]) -> str:
+def _read_image_bytes(image_file: Union[BinaryIO, bytes]) -> bytes:
     """
-    Encode une image en base64 pour l'envoyer à l'API.
+    Lit le contenu binaire d'une image.
 
     Args:
-        image_file: Fichier image (file upload, bytes, ou BytesIO)
+        image_file: Fichier image (file-like ou bytes)
 
     Returns:
-        String base64 de l'image
+        Contenu de l'image
     """
     # Si c'est déjà des bytes
     if isinstance(image_file, bytes):
-        return base64.b64encode(image_file).decode('utf-8')
+        return image_file
 
-    # Si c'est un BytesIO ou un file-like object
+    # Si c'est un file-like object
     try:
         # Sauvegarder la position actuelle
         current_pos = image_file.tell() if hasattr(image_file, 'tell') else 0
@@ -34,13 +34,47 @@ def encode_image(image_file: Union[BinaryIO, bytes, BytesIO]) -> str:
         if hasattr(image_file, 'seek'):
             image_file.seek(current_pos)
 
-        # Encoder en base64
-        return base64.b64encode(image_bytes).decode('utf-8')
+        return image_bytes
 
     except Exception as e:
         raise ValueError(f"Impossible d'encoder l'image: {e}")
 
 
+def encode_image(image_file: Union[BinaryIO, bytes, BytesIO]) -> str:
+    """
+    Encode une image en base64 pour l'envoyer à l'API.
+
+    Args:
+        image_file: Fichier image (file upload, bytes, ou BytesIO)
+
+    Returns:
+        String base64 de l'image
+    """
+    # BytesIO (et UploadedFile de Streamlit) : encoder directement le buffer, sans copie
+    if hasattr(image_file, 'getbuffer'):
+        with image_file.getbuffer() as view:
+            return base64.b64encode(view).decode('ascii')
+
+    return base64.b64encode(_read_image_bytes(image_file)).decode('ascii')
+
+
+def encode_image_data_url(
+    image_file: Union[BinaryIO, bytes, BytesIO],
+    mime_type: str = "image/jpeg"
+) -> str:
+    """
+    Encode une image sous forme d'URL data: prête à être envoyée à l'API.
+
+    Args:
+        image_file: Fichier image (file upload, bytes, ou BytesIO)
+        mime_type: Type MIME déclaré dans l'URL
+
+    Returns:
+        URL "data:<mime>;base64,..." de l'image
+    """
+    return f"data:{mime_type};base64,{encode_image(image_file)}"
+
+
 def validate_image_format(image_file: Union[BinaryIO, bytes, BytesIO]) -> bool:
     """
     Vérifie que le fichier est une image valide.